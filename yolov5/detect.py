@@ -97,6 +97,7 @@ def run(
     half=False,  # use FP16 half-precision inference
     dnn=False,  # use OpenCV DNN for ONNX inference
     vid_stride=1,  # video frame-rate stride
+    on_image=None,  # per-image callback(path, det, im0), det is (n, 6) xyxy, conf, cls in im0 pixels
 ):
     """
     Runs YOLOv5 detection inference on various sources like images, videos, directories, streams, etc.
@@ -133,6 +134,9 @@ def run(
         half (bool): If True, use FP16 half-precision inference. Default is False.
         dnn (bool): If True, use OpenCV DNN backend for ONNX inference. Default is False.
         vid_stride (int): Stride for processing video frames, to skip frames between processing. Default is 1.
+        on_image (callable | None): Called once per processed image as `on_image(path, det, im0)` after boxes are
+            rescaled, where `det` is the (n, 6) tensor of xyxy, confidence, class in original image pixels. Lets callers
+            consume detections in the same pass without re-reading saved labels. Default is None.
 
     Returns:
         None
@@ -245,6 +249,8 @@ def run(
             if len(det):
                 # Rescale boxes from img_size to im0 size
                 det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
+                if on_image is not None:
+                    on_image(p, det, im0)
 
                 # Print results
                 for c in det[:, 5].unique():
@@ -278,6 +284,8 @@ def run(
                         annotator.box_label(xyxy, label, color=colors(c, True))
                     if save_crop:
                         save_one_box(xyxy, imc, file=save_dir / "crops" / names[c] / f"{p.stem}.jpg", BGR=True)
+            elif on_image is not None:  # images without detections are reported too
+                on_image(p, det, im0)
 
             # Stream results
             im0 = annotator.result()
@@ -8,10 +8,14 @@ Usage:
 """
 
 import argparse
+import gzip
+import io
 import os
 import sys
 import cv2
 import json
+import re
+import numpy as np
 from pathlib import Path
 from datetime import datetime
 
@@ -21,7 +25,8 @@ ROOT = FILE.parent  # YOLOv5 root directory
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))  # add ROOT to PATH
 
-from detect import main as detect_main, parse_opt as detect_parse_opt
+from detect import run as detect_run
+from utils.general import increment_path, yaml_load
 
 
 def parse_opt():
@@ -31,7 +36,7 @@ def parse_opt():
     # Essential arguments
     parser.add_argument('--weights', nargs='+', type=str, default='runs/train/cable_check/weights/best.pt', help='model path(s)')
     parser.add_argument('--source', type=str, default='data/images', help='file/dir/URL/glob, 0 for webcam')
-    parser.add_argument('--data', type=str, default='data/laptop_cable_check.yaml', help='(optional) dataset.yaml path')
+    parser.add_argument('--data', type=str, default=None, help='(optional) dataset.yaml path, default: data/laptop_cable_check.yaml')
     parser.add_argument('--imgsz', '--img', '--img-size', nargs='+', type=int, default=[640], help='inference size h,w')
     parser.add_argument('--conf-thres', type=float, default=0.25, help='confidence threshold')
     parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
@@ -59,88 +64,190 @@ def parse_opt():
     # Cable check specific arguments
     parser.add_argument('--cable-report', action='store_true', help='generate cable connection report')
     parser.add_argument('--alert-threshold', type=float, default=0.7, help='confidence threshold for alerts')
-    parser.add_argument('--save-report', action='store_true', help='save detection report as JSON')
+    parser.add_argument('--save-report', action='store_true', help='stream detection reports to JSON Lines')
+    parser.add_argument('--report-gzip', action='store_true', help='gzip-compress the JSON Lines report')
+    parser.add_argument('--fsync-every', type=int, default=100, help='fsync the report file every N images (0 = never)')
     
-    return parser.parse_args()
+    opt = parser.parse_args()
+    opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
+    return opt
 
 
-class CableCheckAnalyzer:
-    """케이블 연결 상태 분석 클래스"""
-    
-    def __init__(self):
-        self.cable_types = {
-            'power': ['power_cable_connected', 'power_cable_disconnected'],
-            'usb': ['usb_cable_connected', 'usb_cable_disconnected'],
-            'hdmi': ['hdmi_cable_connected', 'hdmi_cable_disconnected'],
-            'ethernet': ['ethernet_cable_connected', 'ethernet_cable_disconnected'],
-            'audio': ['audio_cable_connected', 'audio_cable_disconnected']
-        }
-        
-        self.class_names = {
-            0: 'power_cable_connected',
-            1: 'power_cable_disconnected',
-            2: 'usb_cable_connected',
-            3: 'usb_cable_disconnected',
-            4: 'hdmi_cable_connected',
-            5: 'hdmi_cable_disconnected',
-            6: 'ethernet_cable_connected',
-            7: 'ethernet_cable_disconnected',
-            8: 'audio_cable_connected',
-            9: 'audio_cable_disconnected'
+class ReportWriter:
+    """
+    리포트 스트리밍 저장 클래스 (JSON Lines, 이미지당 한 줄)
+
+    리포트를 만들 때마다 바로 기록/flush 하므로 메모리가 늘지 않고, 중간에 종료돼도 그때까지의 리포트는 남는다.
+    close() 시 전체 요약 인덱스를 `<이름>_summary.json` 으로 저장한다.
+    """
+
+    def __init__(self, path, compress=False, fsync_every=100):
+        self.path = Path(path).with_suffix('.jsonl.gz' if compress else '.jsonl')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.summary_path = self.path.parent / f"{self.path.name.split('.')[0]}_summary.json"
+        self.fsync_every = fsync_every
+        self._raw = open(self.path, 'wb')
+        stream = gzip.GzipFile(fileobj=self._raw, mode='wb') if compress else self._raw
+        self._f = io.TextIOWrapper(stream, encoding='utf-8', newline='\n')
+        self.count = 0
+        self.status_counts = {}
+        self.alert_counts = {}
+        self.attention_lines = []  # NEEDS_ATTENTION 리포트의 줄 번호 (0부터)
+        self.first_timestamp = self.last_timestamp = None
+        self._closed = False
+
+    def write(self, report):
+        self._f.write(json.dumps(report, ensure_ascii=False) + '\n')
+        self._f.flush()  # gzip 은 sync flush 로 블록 경계까지 기록
+        status = report['summary']['overall_status']
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if status != 'OK':
+            self.attention_lines.append(self.count)
+        for alert in report['alerts']:
+            self.alert_counts[alert['cable_type']] = self.alert_counts.get(alert['cable_type'], 0) + 1
+        self.first_timestamp = self.first_timestamp or report['timestamp']
+        self.last_timestamp = report['timestamp']
+        self.count += 1
+        if self.fsync_every and self.count % self.fsync_every == 0:
+            os.fsync(self._raw.fileno())
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._f.close()  # gzip trailer 기록 (GzipFile 은 fileobj 를 닫지 않음)
+        self._raw.close()
+        summary = {
+            'reports': str(self.path),
+            'total_images': self.count,
+            'status_counts': self.status_counts,
+            'alerts_by_cable_type': self.alert_counts,
+            'needs_attention_lines': self.attention_lines,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
         }
-        
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"💾 Reports saved to: {self.path} (summary: {self.summary_path})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CableCheckAnalyzer:
+    """
+    케이블 연결 상태 분석 클래스
+
+    클래스 이름 맵을 한 번만 룩업 테이블(class id -> 커넥터 그룹, 상태)로 컴파일해 두고,
+    탐지 텐서 전체에 배열 연산으로 판정한다. 이름이 `<그룹>[_cable]_connected/_disconnected` 형식이면 그 상태로,
+    그 외 이름(예: data/laptop_cable_check.yaml 의 정상 상태만 있는 클래스)은 탐지되면 'connected' 로 본다.
+    같은 그룹에 connected 와 disconnected 가 모두 탐지되면 disconnected 가 우선한다.
+    """
+
+    STATUS = ('unknown', 'connected', 'disconnected')  # 상태 코드 0, 1, 2
+    NAME_PATTERN = re.compile(r'^(.+?)(?:[_-]cable)?[_-](connected|disconnected)$')
+
+    DEFAULT_NAMES = {
+        0: 'power_cable_connected',
+        1: 'power_cable_disconnected',
+        2: 'usb_cable_connected',
+        3: 'usb_cable_disconnected',
+        4: 'hdmi_cable_connected',
+        5: 'hdmi_cable_disconnected',
+        6: 'ethernet_cable_connected',
+        7: 'ethernet_cable_disconnected',
+        8: 'audio_cable_connected',
+        9: 'audio_cable_disconnected'
+    }
+
+    def __init__(self, sink=None, names=None):
+        names = names if names is not None else self.DEFAULT_NAMES
+        self.class_names = dict(enumerate(names)) if isinstance(names, (list, tuple)) else dict(names)
+
+        # Compile class map -> lookup arrays (class id -> group index, status code)
+        self.cable_types = {}  # group -> class names
+        nc = max(self.class_names) + 1 if self.class_names else 0
+        self.class_group = np.full(nc + 1, -1, dtype=np.int64)  # last slot: unknown class ids
+        self.class_status = np.zeros(nc + 1, dtype=np.int8)
+        for class_id, class_name in self.class_names.items():
+            m = self.NAME_PATTERN.match(class_name)
+            group, status = (m.group(1), m.group(2)) if m else (class_name, 'connected')
+            self.cable_types.setdefault(group, []).append(class_name)
+            self.class_group[class_id] = list(self.cable_types).index(group)
+            self.class_status[class_id] = self.STATUS.index(status)
+        self.groups = list(self.cable_types)
+
+        self.sink = sink  # ReportWriter, 설정 시 리포트를 메모리에 쌓지 않고 바로 기록
         self.reports = []
-    
+
+    @classmethod
+    def from_yaml(cls, data, sink=None):
+        """dataset.yaml 의 names 로 분석기 생성"""
+        return cls(sink, yaml_load(data)['names'])
+
+    def analyze_batch(self, detections, image_paths):
+        """여러 이미지의 (n,6) 탐지 결과를 한 번에 분석 -> 이미지별 리포트 리스트"""
+        b, ng = len(image_paths), len(self.groups)
+        dets = [np.asarray(d, dtype=np.float32).reshape(-1, 6) for d in detections]
+        image_index = np.repeat(np.arange(b), [len(d) for d in dets])
+        det = np.concatenate(dets, 0) if dets else np.zeros((0, 6), dtype=np.float32)
+
+        # Look up group / status of every detection at once
+        cls = det[:, 5].astype(np.int64)
+        cls = np.where((cls >= 0) & (cls < len(self.class_group) - 1), cls, len(self.class_group) - 1)
+        group, status = self.class_group[cls], self.class_status[cls]
+        known = group >= 0
+        image_index, group, status, conf = image_index[known], group[known], status[known], det[known, 4]
+
+        # Per-image, per-group status (disconnected > connected > unknown)
+        cable_status = np.zeros((b, ng), dtype=np.int8)
+        np.maximum.at(cable_status, (image_index, group), status)
+        counts = np.stack([(cable_status == k).sum(1) for k in range(len(self.STATUS))], 1)  # (b, 3)
+        alert = status == 2
+
+        # Per-batch lookups, the loop below only slices them (detections are ordered by image)
+        status_names = np.array(self.STATUS, dtype=object)[cable_status].tolist()  # (b, ng) names
+        alert_groups = np.array(self.groups, dtype=object)[group[alert]].tolist()
+        alert_conf = conf[alert].tolist()
+        bounds = np.searchsorted(image_index[alert], np.arange(b + 1)).tolist()  # alerts of image i: bounds[i:i+2]
+        counts = counts.tolist()
+
+        timestamp = datetime.now().isoformat()
+        reports = []
+        for i, path in enumerate(image_paths):
+            a0, a1 = bounds[i], bounds[i + 1]
+            unknown, connected, disconnected = counts[i]
+            report = {
+                'image': str(path),
+                'timestamp': timestamp,
+                'cable_status': dict(zip(self.groups, status_names[i])),
+                'alerts': [{
+                    'type': 'disconnected_cable',
+                    'cable_type': g,
+                    'confidence': c,
+                    'message': f'{g.upper()} cable is disconnected!'
+                } for g, c in zip(alert_groups[a0:a1], alert_conf[a0:a1])],
+                'summary': {
+                    'total_cables': ng,
+                    'connected': connected,
+                    'disconnected': disconnected,
+                    'unknown': unknown,
+                    'overall_status': 'OK' if disconnected == 0 else 'NEEDS_ATTENTION'
+                }
+            }
+            if self.sink is not None:
+                self.sink.write(report)
+            else:
+                self.reports.append(report)
+            reports.append(report)
+        return reports
+
     def analyze_detections(self, detections, image_path):
         """탐지 결과 분석"""
-        report = {
-            'image': str(image_path),
-            'timestamp': datetime.now().isoformat(),
-            'cable_status': {},
-            'alerts': [],
-            'summary': {}
-        }
-        
-        # Initialize cable status
-        for cable_type in self.cable_types.keys():
-            report['cable_status'][cable_type] = 'unknown'
-        
-        # Process detections
-        for detection in detections:
-            class_id = int(detection[5])
-            confidence = float(detection[4])
-            class_name = self.class_names.get(class_id, 'unknown')
-            
-            # Determine cable type and connection status
-            for cable_type, class_list in self.cable_types.items():
-                if class_name in class_list:
-                    if 'connected' in class_name:
-                        report['cable_status'][cable_type] = 'connected'
-                    elif 'disconnected' in class_name:
-                        report['cable_status'][cable_type] = 'disconnected'
-                        # Add alert for disconnected cables
-                        report['alerts'].append({
-                            'type': 'disconnected_cable',
-                            'cable_type': cable_type,
-                            'confidence': confidence,
-                            'message': f'{cable_type.upper()} cable is disconnected!'
-                        })
-        
-        # Generate summary
-        connected_count = sum(1 for status in report['cable_status'].values() if status == 'connected')
-        disconnected_count = sum(1 for status in report['cable_status'].values() if status == 'disconnected')
-        unknown_count = sum(1 for status in report['cable_status'].values() if status == 'unknown')
-        
-        report['summary'] = {
-            'total_cables': len(self.cable_types),
-            'connected': connected_count,
-            'disconnected': disconnected_count,
-            'unknown': unknown_count,
-            'overall_status': 'OK' if disconnected_count == 0 else 'NEEDS_ATTENTION'
-        }
-        
-        self.reports.append(report)
-        return report
+        return self.analyze_batch([detections], [image_path])[0]
     
     def print_report(self, report):
         """리포트 출력"""
@@ -176,12 +283,18 @@ def main(opt):
     print("🔍 Starting YOLOv5 Cable Check Detection")
     print("=" * 50)
     
-    # Initialize cable analyzer
-    analyzer = CableCheckAnalyzer()
-    
     # Update opt with cable check specific settings
-    opt.data = str(ROOT / 'data' / 'laptop_cable_check.yaml')
-    opt.name = 'cable_check_detection'
+    if not opt.data:
+        opt.data = str(ROOT / 'data' / 'laptop_cable_check.yaml')
+    # Resolve the run directory once; the report writer creates it before detect.run would increment again
+    save_dir = increment_path(Path(opt.project) / 'cable_check_detection', exist_ok=opt.exist_ok)
+    opt.name, opt.exist_ok = save_dir.name, True
+
+    # Initialize cable analyzer (reports stream to disk with --save-report)
+    sink = None
+    if opt.save_report:
+        sink = ReportWriter(save_dir / 'cable_report', opt.report_gzip, opt.fsync_every)
+    analyzer = CableCheckAnalyzer.from_yaml(opt.data, sink)
     
     print(f"🔧 Detection Configuration:")
     print(f"   - Model: {opt.weights}")
@@ -190,18 +303,21 @@ def main(opt):
     print(f"   - Alert Threshold: {opt.alert_threshold}")
     print("=" * 50)
     
-    # Run detection using YOLOv5's main detection function
-    # Note: You would need to modify this to capture detection results
-    # For now, we'll use the standard detect function
-    detect_main(opt)
+    # Run detection, feeding each image's (n,6) detections to the analyzer in the same pass
+    def on_image(path, det, im0):
+        report = analyzer.analyze_detections(det.cpu().numpy(), path)
+        if opt.cable_report:
+            analyzer.print_report(report)
+
+    cable_args = ('cable_report', 'alert_threshold', 'save_report', 'report_gzip', 'fsync_every')
+    detect_args = {k: v for k, v in vars(opt).items() if k not in cable_args}
+    try:
+        detect_run(**detect_args, on_image=on_image if opt.cable_report or opt.save_report else None)
+    finally:
+        if sink is not None:
+            sink.close()  # write summary index even if detection is interrupted
     
     print("🎉 Cable Check Detection Completed!")
-    
-    # If cable report is requested, save it
-    if opt.save_report:
-        report_path = Path(opt.project) / opt.name / 'cable_report.json'
-        report_path.parent.mkdir(parents=True, exist_ok=True)
-        analyzer.save_reports(report_path)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+YOLOv5 Cable Check Pre-labeling Script
+학습된 모델로 이미지 폴더의 라벨 후보(YOLO txt)를 일괄 생성 -> simple_labeler 에서 수정 후 저장
+
+후보는 <이미지 폴더>/proposals/<이름>.txt 에 저장되어 사람이 저장한 라벨(<이름>.txt)과 섞이지 않는다.
+이미 라벨이 있는 이미지와, 이미지 / 모델이 그대로인 이미지는 건너뛰어 폴더가 늘어나도 새 이미지만 추론한다.
+
+Usage:
+    python prelabel.py --source path/to/images --weights runs/train/cable_check/weights/best.pt
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+# Add YOLOv5 root to path
+FILE = Path(__file__).resolve()
+ROOT = FILE.parent  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from models.common import DetectMultiBackend
+from prepare_dataset import file_stat, hash_file
+from simple_labeler import PROPOSAL_DIR, find_images
+from utils.augmentations import letterbox
+from utils.general import check_img_size, non_max_suppression, scale_boxes, xyxy2xywh
+from utils.torch_utils import select_device
+
+MANIFEST_NAME = '.prelabel_manifest.json'  # proposals 폴더에 저장 (이미지 이름 -> 해시 / stat / 모델)
+
+
+def parse_opt():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='YOLOv5 Cable Check Pre-labeling')
+    parser.add_argument('--weights', type=str, default='runs/train/cable_check/weights/best.pt', help='model path')
+    parser.add_argument('--source', type=str, required=True, help='image folder (same as simple_labeler)')
+    parser.add_argument('--imgsz', '--img', '--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-size', type=int, default=16, help='images per inference batch')
+    parser.add_argument('--conf-thres', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--max-det', type=int, default=100, help='maximum proposals per image')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
+    parser.add_argument('--workers', type=int, default=4, help='image loading threads')
+    parser.add_argument('--force', action='store_true', help='re-propose every unlabeled image')
+    return parser.parse_args()
+
+
+def load_letterboxed(args):
+    """워커: 이미지 읽기 + 고정 크기 레터박스 -> (경로, CHW RGB 배열, 원본 hw), 실패 시 배열은 None"""
+    path, imgsz, stride = args
+    im0 = cv2.imread(str(path))  # BGR (simple_labeler 와 같은 EXIF 회전)
+    if im0 is None:
+        return path, None, None
+    im = letterbox(im0, imgsz, stride=stride, auto=False)[0]  # 배치로 쌓을 수 있게 같은 크기로
+    return path, np.ascontiguousarray(im.transpose((2, 0, 1))[::-1]), im0.shape[:2]
+
+
+class PreLabeler:
+    """DetectMultiBackend 배치 추론으로 라벨 후보 생성"""
+
+    def __init__(self, weights, device='', imgsz=640, half=False):
+        self.device = select_device(device)
+        self.model = DetectMultiBackend(weights, device=self.device, fp16=half)
+        self.imgsz = check_img_size(imgsz, s=self.model.stride)
+        self.model.warmup(imgsz=(1, 3, self.imgsz, self.imgsz))
+        self.weights_hash = hash_file(weights)
+        self.stats = {'labeled': 0, 'unchanged': 0, 'proposed': 0, 'boxes': 0, 'failed': 0}
+
+    def find_todo(self, image_files, manifest, force=False):
+        """
+        추론할 이미지 고르기 -> [(경로, 해시)]
+
+        사람이 만든 라벨이 있으면 건너뛰고, 후보가 있는 이미지는 stat -> 내용 해시 순으로 변경 여부를 확인한다.
+        """
+        todo, candidates = [], []
+        for f in image_files:
+            entry = manifest.get(f.name)
+            if f.with_suffix('.txt').exists():
+                self.stats['labeled'] += 1
+            elif force or not entry or entry['weights'] != self.weights_hash \
+                    or not (f.parent / PROPOSAL_DIR / f.with_suffix('.txt').name).exists():
+                todo.append(f)
+            elif entry['stat'] != file_stat(f):
+                candidates.append(f)  # 수정시각만 바뀌었을 수 있음 -> 해시로 확인
+            else:
+                self.stats['unchanged'] += 1
+
+        with ThreadPool(8) as pool:
+            hashes = pool.map(hash_file, map(str, todo + candidates))
+        hashes = dict(zip(todo + candidates, hashes))
+        for f in candidates:
+            if hashes[f] == manifest[f.name]['hash']:
+                manifest[f.name]['stat'] = file_stat(f)
+                self.stats['unchanged'] += 1
+            else:
+                todo.append(f)
+        return [(f, hashes[f]) for f in todo]
+
+    def run(self, folder, batch_size=16, conf_thres=0.25, iou_thres=0.45, max_det=100, workers=4, force=False):
+        """폴더 전체 라벨 후보 생성"""
+        folder = Path(folder)
+        out_dir = folder / PROPOSAL_DIR
+        out_dir.mkdir(exist_ok=True)
+        manifest_path = out_dir / MANIFEST_NAME
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+
+        image_files = sorted(find_images(folder))
+        todo = self.find_todo(image_files, manifest, force)
+        print(f"📸 {len(image_files)} images: {self.stats['labeled']} labeled, {self.stats['unchanged']} unchanged, "
+              f"{len(todo)} to pre-label")
+        hashes = dict(todo)
+
+        t = time.perf_counter()
+        stride = int(self.model.stride)
+        try:
+            # 배치 2개 분량씩 읽기: 다음 청크는 추론과 겹쳐서 읽고, 그 이상은 미리 읽지 않는다 (메모리 상한)
+            jobs = [(f, self.imgsz, stride) for f, _ in todo]
+            chunks = [jobs[i:i + 2 * batch_size] for i in range(0, len(jobs), 2 * batch_size)]
+            with ThreadPool(workers) as pool:
+                pending = pool.map_async(load_letterboxed, chunks[0]) if chunks else None
+                batch, n = [], 0
+                for j in range(len(chunks)):
+                    loaded = pending.get()
+                    pending = pool.map_async(load_letterboxed, chunks[j + 1]) if j + 1 < len(chunks) else None
+                    for item in loaded:
+                        n += 1
+                        if item[1] is None:
+                            print(f"❌ Cannot read {item[0]}")
+                            self.stats['failed'] += 1
+                        else:
+                            batch.append(item)
+                        if len(batch) == batch_size or (batch and n == len(todo)):
+                            self.predict(batch, out_dir, manifest, hashes, conf_thres, iou_thres, max_det)
+                            batch = []
+                            print(f"   Progress: {n}/{len(todo)}")
+        finally:
+            manifest_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+        dt = time.perf_counter() - t
+        print(f"✅ {self.stats['proposed']} images pre-labeled ({self.stats['boxes']} boxes) in {dt:.1f}s "
+              f"({self.stats['proposed'] / dt if dt else 0:.1f} images/s) -> {out_dir}")
+        return self.stats
+
+    def predict(self, batch, out_dir, manifest, hashes, conf_thres, iou_thres, max_det):
+        """배치 1개 추론 후 이미지별 YOLO txt 후보 저장"""
+        paths, ims, shapes = zip(*batch)
+        im = torch.from_numpy(np.stack(ims)).to(self.device)
+        im = (im.half() if self.model.fp16 else im.float()) / 255  # uint8 to fp16/32, 0 - 255 to 0.0 - 1.0
+        pred = non_max_suppression(self.model(im), conf_thres, iou_thres, max_det=max_det)
+
+        for path, shape, det in zip(paths, shapes, pred):
+            det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shape)
+            gn = torch.tensor(shape, device=det.device)[[1, 0, 1, 0]]  # normalization gain whwh
+            xywh = (xyxy2xywh(det[:, :4]) / gn).tolist()
+            lines = [f"{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}" for c, (x, y, w, h) in zip(det[:, 5].tolist(), xywh)]
+            (out_dir / path.with_suffix('.txt').name).write_text(''.join(line + '\n' for line in lines))
+            manifest[path.name] = {'hash': hashes[path], 'stat': file_stat(path), 'weights': self.weights_hash}
+            self.stats['proposed'] += 1
+            self.stats['boxes'] += len(lines)
+
+
+def main():
+    """Main function"""
+    opt = parse_opt()
+    if not os.path.isdir(opt.source):
+        print(f"❌ 폴더가 없어요: {opt.source}")
+        return
+    labeler = PreLabeler(opt.weights, device=opt.device, imgsz=opt.imgsz, half=opt.half)
+    labeler.run(opt.source, batch_size=opt.batch_size, conf_thres=opt.conf_thres, iou_thres=opt.iou_thres,
+                max_det=opt.max_det, workers=opt.workers, force=opt.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,20 @@ Usage:
 """
 
 import argparse
+import hashlib
 import os
 import shutil
 import random
+import time
+from multiprocessing.pool import Pool
 from pathlib import Path
 import json
-from PIL import Image
+import numpy as np
+from PIL import Image, ImageOps
+
+MANIFEST_NAME = '.prepare_manifest.json'  # 증분 처리용 매니페스트 (출력 폴더에 저장)
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+PHASH_CACHE_NAME = '.phash_cache.json'  # 지각 해시 캐시 (출력 폴더에 저장)
 
 
 def parse_opt():
@@ -26,19 +34,231 @@ def parse_opt():
     parser.add_argument('--test_ratio', type=float, default=0.1, help='test set ratio')
     parser.add_argument('--resize', type=int, default=640, help='resize images to this size')
     parser.add_argument('--check_labels', action='store_true', help='check if label files exist')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='reprocess all images, ignoring the manifest')
+    parser.add_argument('--shards', action='store_true', help='also pack each split into a memory-mapped shard')
+    parser.add_argument('--dedup', type=str, choices=['dhash', 'phash'], help='cluster near-duplicate images')
+    parser.add_argument('--dedup_radius', type=int, default=6, help='max Hamming distance (of 64 bits) for duplicates')
+    parser.add_argument('--dedup_mode', type=str, default='group', choices=['group', 'drop'],
+                        help='group: keep each cluster within one split, drop: keep one image per cluster')
     
     return parser.parse_args()
 
 
+def hash_file(path, chunk=1 << 20):
+    """파일 내용 해시 (SHA1), 파일이 없으면 None"""
+    if not os.path.isfile(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_stat(path):
+    """(크기, 수정시각) - 해시 계산 전 빠른 변경 확인용, 파일이 없으면 None"""
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+def hash_pair(args):
+    """워커: 이미지 / 라벨 내용 해시"""
+    image_path, label_path = args
+    return hash_file(image_path), hash_file(label_path)
+
+
+def resize_image(image_path, output_path, size=640):
+    """
+    이미지 비율 유지 리사이즈 + 정사각형 회색 패딩 (워커 프로세스에서도 호출)
+
+    라벨 변환용 (x 배율, y 배율, x 패딩, y 패딩)을 정규화 좌표 기준으로 반환한다.
+    """
+    with Image.open(image_path) as img:
+        # 큰 JPEG 는 디코딩 전에 축소 디코딩 요청 (1/2~1/8, size 이상 유지. exif_transpose 가 디코딩하기 전에 해야 함)
+        img.draft('RGB', (size, size))
+
+        # EXIF 회전 적용 (라벨은 회전이 적용된 화면 기준으로 작성됨)
+        img = ImageOps.exif_transpose(img)
+
+        if img.mode not in ('RGB', 'RGBA', 'L'):
+            img = img.convert('RGB')
+
+        # 비율 유지하면서 리사이즈
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        # RGB로 변환 (PNG의 경우 RGBA일 수 있음)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # 정사각형으로 패딩
+        w, h = img.size
+        pad_x, pad_y = (size - w) // 2, (size - h) // 2
+        new_img = Image.new('RGB', (size, size), (114, 114, 114))
+        new_img.paste(img, (pad_x, pad_y))
+
+        new_img.save(output_path, quality=95)
+        return w / size, h / size, pad_x / size, pad_y / size
+
+
+def letterbox_labels(label_path, output_path, transform):
+    """YOLO 라벨(박스 또는 폴리곤)을 resize_image 의 레터박스 변환에 맞게 좌표 변환해서 저장"""
+    sx, sy, ox, oy = transform
+    lines = []
+    with open(label_path) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            values = [float(x) for x in parts[1:]]
+            if len(values) == 4:  # class x_center y_center width height
+                x, y, w, h = values
+                values = [x * sx + ox, y * sy + oy, w * sx, h * sy]
+            else:  # class x1 y1 x2 y2 ... (segment)
+                values = [v * sx + ox if i % 2 == 0 else v * sy + oy for i, v in enumerate(values)]
+            lines.append(' '.join([parts[0]] + [f'{v:.6f}' for v in values]))
+    with open(output_path, 'w') as f:
+        f.write('\n'.join(lines) + ('\n' if lines else ''))
+
+
+def process_file(args):
+    """워커: 이미지 1장 복사/리사이즈 + 라벨 복사 -> (원본, 성공 여부, 처리 바이트, 단계별 시간, 에러 메시지)"""
+    image_path, image_out, label_path, label_out, resize_size = args
+    times = {'image': 0.0, 'label': 0.0}
+    try:
+        t = time.perf_counter()
+        transform = None
+        if resize_size:
+            transform = resize_image(image_path, image_out, resize_size)
+        else:
+            shutil.copy2(image_path, image_out)
+        times['image'] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        if os.path.isfile(label_path):
+            if transform:
+                letterbox_labels(label_path, label_out, transform)  # 리사이즈/패딩된 이미지 좌표로
+            else:
+                shutil.copy2(label_path, label_out)
+        times['label'] = time.perf_counter() - t
+        return image_path, True, os.path.getsize(image_path), times, ''
+    except Exception as e:
+        return image_path, False, 0, times, f"❌ Error processing {image_path}: {e}"
+
+
+def dhash(img, hash_size=8):
+    """dHash: 가로로 인접한 픽셀 밝기 비교 -> 64비트 정수"""
+    px = np.asarray(img.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR), dtype=np.int16)
+    return int(np.packbits(px[:, 1:] > px[:, :-1]).tobytes().hex(), 16)
+
+
+def phash(img, hash_size=8, highfreq=4):
+    """pHash: 32x32 DCT 의 저주파 8x8 계수를 중앙값과 비교 -> 64비트 정수"""
+    n = hash_size * highfreq
+    px = np.asarray(img.resize((n, n), Image.Resampling.LANCZOS), dtype=np.float64)
+    k = np.arange(n)
+    dct = np.cos(np.pi * (2 * k[None] + 1) * k[:, None] / (2 * n))  # DCT-II 행렬
+    low = (dct @ px @ dct.T)[:hash_size, :hash_size]
+    return int(np.packbits(low > np.median(low.flatten()[1:])).tobytes().hex(), 16)  # DC 성분 제외한 중앙값
+
+
+def perceptual_hash(args):
+    """워커: (이미지 경로, 'dhash' | 'phash') -> (경로, 16진수 해시 문자열 또는 None)"""
+    image_path, algorithm = args
+    try:
+        with Image.open(image_path) as img:
+            img.draft('L', (64, 64))  # JPEG 는 1/8 까지 축소 디코딩
+            img = ImageOps.exif_transpose(img).convert('L')
+            value = (dhash if algorithm == 'dhash' else phash)(img)
+        return image_path, f'{value:016x}'
+    except Exception:
+        return image_path, None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """해밍 거리 BK-트리 - 반경 r 이내의 해시를 전체 비교 없이 찾기"""
+
+    def __init__(self):
+        self.root = None  # [해시, 항목 목록, {거리: 자식 노드}]
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:  # 같은 해시
+                node[1].append(item)
+                return
+            if d not in node[2]:
+                node[2][d] = [value, [item], {}]
+                return
+            node = node[2][d]
+
+    def query(self, value, radius):
+        """해밍 거리 radius 이내인 항목 목록"""
+        found, stack = [], [self.root] if self.root else []
+        while stack:
+            node_value, items, children = stack.pop()
+            d = hamming(value, node_value)
+            if d <= radius:
+                found.extend(items)
+            stack.extend(child for k, child in children.items() if d - radius <= k <= d + radius)  # 삼각부등식
+        return found
+
+
+def image_size(image_path):
+    """EXIF 회전을 반영한 (w, h) - 헤더만 읽음"""
+    with Image.open(image_path) as img:
+        w, h = img.size
+        if img.getexif().get(0x0112) in (5, 6, 7, 8):  # 90도 / 270도 회전
+            w, h = h, w
+    return w, h
+
+
+def read_label_boxes(label_path):
+    """YOLO 라벨 -> (n, 5) float32 [class, x, y, w, h] (폴리곤은 외접 박스로)"""
+    rows = []
+    if os.path.isfile(label_path):
+        with open(label_path) as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                values = [float(x) for x in parts[1:]]
+                if len(values) > 4:  # segment -> box
+                    xs, ys = values[0::2], values[1::2]
+                    values = [(min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2, max(xs) - min(xs), max(ys) - min(ys)]
+                rows.append([float(parts[0])] + values)
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
 class DatasetPreparer:
     """데이터셋 준비 클래스"""
     
-    def __init__(self, source_dir, output_dir, train_ratio=0.7, val_ratio=0.2, test_ratio=0.1):
+    def __init__(self, source_dir, output_dir, train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, workers=None,
+                 force=False, dedup=None, dedup_radius=6, dedup_mode='group'):
         self.source_dir = Path(source_dir)
         self.output_dir = Path(output_dir)
         self.train_ratio = train_ratio
         self.val_ratio = val_ratio
         self.test_ratio = test_ratio
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.force = force  # True 면 매니페스트 무시하고 전부 다시 처리
+        self.manifest_path = self.output_dir / MANIFEST_NAME
+        self.manifest = {}  # 원본 상대경로 -> 해시 / stat / split / resize 설정
+        self.pending = {}  # 처리 대기 중인 파일의 새 해시 (출력이 써진 뒤에만 매니페스트에 반영)
+        self.dedup = dedup  # None, 'dhash', 'phash'
+        self.dedup_radius = dedup_radius
+        self.dedup_mode = dedup_mode  # 'group': 클러스터를 한 split 에, 'drop': 클러스터당 1장만
         
         # 클래스 이름 매핑 (정상 상태만)
         self.class_names = {
@@ -55,7 +275,12 @@ class DatasetPreparer:
             'train_images': 0,
             'val_images': 0,
             'test_images': 0,
-            'class_distribution': {}
+            'processed_images': 0,
+            'skipped_images': 0,
+            'removed_images': 0,
+            'class_distribution': {},
+            'duplicates': {},
+            'throughput': {}
         }
     
     def create_directory_structure(self):
@@ -78,94 +303,300 @@ class DatasetPreparer:
     
     def get_image_files(self):
         """이미지 파일 목록 가져오기"""
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
         image_files = []
         
-        for ext in image_extensions:
+        for ext in IMAGE_EXTENSIONS:
             image_files.extend(self.source_dir.glob(f'**/*{ext}'))
             image_files.extend(self.source_dir.glob(f'**/*{ext.upper()}'))
         
         return image_files
     
-    def resize_image(self, image_path, output_path, size=640):
-        """이미지 크기 조정"""
+    def resize_image(self, image_path, output_path, size=640, label_path=None, label_output_path=None):
+        """이미지 크기 조정 (라벨 경로를 주면 라벨도 같은 변환으로 좌표 변환)"""
         try:
-            with Image.open(image_path) as img:
-                # RGB로 변환 (PNG의 경우 RGBA일 수 있음)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # 비율 유지하면서 리사이즈
-                img.thumbnail((size, size), Image.Resampling.LANCZOS)
-                
-                # 정사각형으로 패딩
-                new_img = Image.new('RGB', (size, size), (114, 114, 114))
-                new_img.paste(img, ((size - img.size[0]) // 2, (size - img.size[1]) // 2))
-                
-                new_img.save(output_path, quality=95)
-                return True
+            transform = resize_image(image_path, output_path, size)
+            if label_path and Path(label_path).exists():
+                letterbox_labels(label_path, label_output_path, transform)
+            return True
         except Exception as e:
             print(f"❌ Error resizing {image_path}: {e}")
             return False
     
-    def split_dataset(self, image_files):
-        """데이터셋 분할"""
-        random.shuffle(image_files)
+    def split_dataset(self, image_files, groups=None):
+        """데이터셋 분할 (groups 가 주어지면 같은 그룹(중복 클러스터)은 같은 split 으로)"""
+        if groups is None:
+            groups = [[f] for f in image_files]
+        random.shuffle(groups)
         
-        total = len(image_files)
+        total = sum(map(len, groups))
         train_end = int(total * self.train_ratio)
         val_end = train_end + int(total * self.val_ratio)
         
-        train_files = image_files[:train_end]
-        val_files = image_files[train_end:val_end]
-        test_files = image_files[val_end:]
+        train_files, val_files, test_files = [], [], []
+        for group in groups:
+            n = len(train_files) + len(val_files)
+            (train_files if len(train_files) < train_end else val_files if n < val_end else test_files).extend(group)
         
         return {
             'train': train_files,
             'val': val_files,
             'test': test_files
         }
+
+    def find_duplicates(self, image_files):
+        """
+        지각 해시(병렬, 캐시)로 유사 이미지 클러스터 찾기 -> 클러스터 목록 (중복 없는 이미지는 1장짜리 클러스터)
+
+        BK-트리로 해밍 거리 dedup_radius 이내 쌍을 찾고, 연결된 쌍을 하나의 클러스터로 묶는다 (연사 사진).
+        """
+        cache_path = self.output_dir / PHASH_CACHE_NAME
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except Exception:
+            cache = {}
+
+        hashes, todo = {}, []
+        for f in image_files:
+            entry = cache.get(self._key(f))
+            if entry and entry['algorithm'] == self.dedup and entry['stat'] == file_stat(f):
+                hashes[f] = entry['hash']
+            else:
+                todo.append(f)
+
+        t = time.perf_counter()
+        with Pool(self.workers) as pool:
+            for path, value in pool.imap_unordered(perceptual_hash, [(str(f), self.dedup) for f in todo], chunksize=8):
+                f = Path(path)
+                hashes[f] = value
+                cache[self._key(f)] = {'algorithm': self.dedup, 'stat': file_stat(f), 'hash': value}
+        self._throughput(self.dedup, len(todo), time.perf_counter() - t)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({self._key(f): cache[self._key(f)] for f in image_files}, f, ensure_ascii=False)
+
+        # BK-트리 반경 검색 + union-find
+        parent = list(range(len(image_files)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        tree = BKTree()
+        for i, f in enumerate(image_files):
+            if hashes[f] is None:  # 읽기 실패 -> 단독 클러스터
+                continue
+            value = int(hashes[f], 16)
+            for j in tree.query(value, self.dedup_radius):
+                parent[find(j)] = find(i)
+            tree.add(value, i)
+
+        clusters = {}
+        for i, f in enumerate(image_files):
+            clusters.setdefault(find(i), []).append(f)
+        return list(clusters.values())
+
+    def group_by_cluster(self, new_files, clusters, file_splits):
+        """
+        새 이미지를 클러스터 단위로 묶기 -> 새로 분할할 그룹 목록
+
+        같은 클러스터에 이미 split 이 정해진 이미지가 있으면 새 이미지도 그 split 으로 보낸다 (file_splits 에 추가).
+        """
+        new = set(new_files)
+        groups, leaked = [], 0
+        for cluster in clusters:
+            fresh = [f for f in cluster if f in new]
+            splits = {self.manifest[self._key(f)]['split'] for f in cluster
+                      if f not in new and 'split' in self.manifest.get(self._key(f), {})}
+            leaked += len(splits) > 1
+            if not fresh:
+                continue
+            if splits:
+                file_splits[sorted(splits)[0]] += fresh
+            else:
+                groups.append(fresh)
+        if leaked:
+            print(f"⚠️ {leaked} duplicate clusters already span several splits (use --force to re-split)")
+        self.stats['duplicates']['leaked_clusters'] = leaked
+        return groups
+
+    def _key(self, file_path):
+        """매니페스트 키 (원본 폴더 기준 상대경로)"""
+        return Path(file_path).relative_to(self.source_dir).as_posix()
+
+    def _outputs(self, file_path, split_name):
+        image_out = self.output_dir / 'images' / split_name / file_path.name
+        label_out = self.output_dir / 'labels' / split_name / file_path.with_suffix('.txt').name
+        return image_out, label_out
+
+    def _throughput(self, stage, n, seconds, nbytes=0):
+        """단계별 처리량 기록"""
+        self.stats['throughput'][stage] = {
+            'files': n,
+            'seconds': round(seconds, 3),
+            'files_per_s': round(n / seconds, 1) if seconds > 0 else None,
+            'MB_per_s': round(nbytes / seconds / 1e6, 1) if seconds > 0 and nbytes else None,
+        }
+
+    def load_manifest(self):
+        """이전 실행의 매니페스트 로드"""
+        if self.force or not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return {k: v for k, v in json.load(f).items() if 'split' in v}  # 처리 완료된 항목만
+        except Exception as e:
+            print(f"⚠️ Manifest ignored ({e})")
+            return {}
+
+    def save_manifest(self):
+        tmp = self.manifest_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in self.manifest.items() if 'split' in v}, f, ensure_ascii=False)
+        tmp.replace(self.manifest_path)
+
+    def _is_current(self, file_path, entry, resize_size):
+        """매니페스트 항목이 같은 설정으로 처리되었고 출력이 남아 있는지"""
+        return entry.get('resize') == resize_size and self._outputs(file_path, entry['split'])[0].exists()
+
+    def find_changed(self, image_files, resize_size=None):
+        """
+        변경된 이미지 찾기 -> (새로 분할할 파일, 기존 split 유지할 파일 {split: [..]}, 건너뛸 파일 수)
+
+        크기/수정시각이 같으면 해시 없이 건너뛰고, 다르면 내용 해시(병렬)로 실제 변경 여부를 확인한다.
+        이미 처리된 파일은 이전 split 을 유지해서 재실행 때 train/val 이 섞이지 않게 한다.
+        """
+        unchanged, candidates = {}, []
+        for f in image_files:
+            entry = self.manifest.get(self._key(f))
+            if entry and self._is_current(f, entry, resize_size) and entry['stat'] == file_stat(f) \
+                    and entry['label_stat'] == file_stat(f.with_suffix('.txt')):
+                unchanged[self._key(f)] = entry
+            else:
+                candidates.append(f)
+
+        # 내용 해시 (병렬) - stat 만 바뀐 파일은 해시가 같으면 건너뛰기
+        t = time.perf_counter()
+        with Pool(self.workers) as pool:
+            hashes = pool.map(hash_pair, [(str(f), str(f.with_suffix('.txt'))) for f in candidates], chunksize=8)
+        nbytes = sum(os.path.getsize(f) for f in candidates)
+        self._throughput('hash', len(candidates), time.perf_counter() - t, nbytes)
+
+        new_files, keep = [], {'train': [], 'val': [], 'test': []}
+        for f, (image_hash, label_hash) in zip(candidates, hashes):
+            key = self._key(f)
+            entry = self.manifest.get(key)
+            if entry:
+                if self._is_current(f, entry, resize_size) and (entry['hash'], entry['label_hash']) == (image_hash, label_hash):
+                    entry['stat'], entry['label_stat'] = file_stat(f), file_stat(f.with_suffix('.txt'))
+                    unchanged[key] = entry
+                else:
+                    keep[entry['split']].append(f)
+                    self.pending[key] = image_hash, label_hash
+            else:
+                new_files.append(f)
+                self.pending[key] = image_hash, label_hash
+
+        for key, entry in unchanged.items():
+            self.stats[f"{entry['split']}_images"] += 1
+            self.stats['total_images'] += 1
+        self.stats['skipped_images'] = len(unchanged)
+        return new_files, keep, len(unchanged)
+
+    def remove_stale(self, image_files):
+        """원본에서 사라진 이미지의 출력 파일 삭제"""
+        present = {self._key(f) for f in image_files}
+        for key in [k for k in self.manifest if k not in present]:
+            entry = self.manifest.pop(key)
+            if 'split' not in entry:
+                continue
+            for p in self._outputs(Path(key), entry['split']):
+                if p.exists():
+                    p.unlink()
+            self.stats['removed_images'] += 1
     
     def copy_files(self, file_splits, resize_size=None):
-        """파일 복사 및 처리"""
-        print("📋 Copying and processing files...")
-        
+        """파일 복사 및 처리 (프로세스 풀 병렬)"""
+        print(f"📋 Copying and processing files ({self.workers} workers)...")
+
+        jobs, splits = [], {}
         for split_name, files in file_splits.items():
-            print(f"\n📂 Processing {split_name} set ({len(files)} files)...")
-            
-            for i, file_path in enumerate(files):
+            print(f"   {split_name}: {len(files)} files")
+            for file_path in files:
+                image_out, label_out = self._outputs(file_path, split_name)
+                jobs.append((str(file_path), str(image_out), str(file_path.with_suffix('.txt')), str(label_out),
+                             resize_size))
+                splits[str(file_path)] = split_name
+
+        t = time.perf_counter()
+        image_time, label_time, nbytes = 0.0, 0.0, 0
+        with Pool(self.workers) as pool:
+            for i, (src, success, size, times, msg) in enumerate(pool.imap_unordered(process_file, jobs, chunksize=4)):
                 # 진행 상황 표시
-                if (i + 1) % 10 == 0 or i == len(files) - 1:
-                    print(f"   Progress: {i + 1}/{len(files)}")
-                
-                # 출력 경로 설정
-                output_image_path = self.output_dir / 'images' / split_name / file_path.name
-                
-                # 이미지 복사 또는 리사이즈
-                if resize_size:
-                    success = self.resize_image(file_path, output_image_path, resize_size)
-                else:
-                    try:
-                        shutil.copy2(file_path, output_image_path)
-                        success = True
-                    except Exception as e:
-                        print(f"❌ Error copying {file_path}: {e}")
-                        success = False
-                
-                if success:
-                    # 라벨 파일 찾기 및 복사
-                    label_file = file_path.with_suffix('.txt')
-                    if label_file.exists():
-                        output_label_path = self.output_dir / 'labels' / split_name / label_file.name
-                        try:
-                            shutil.copy2(label_file, output_label_path)
-                        except Exception as e:
-                            print(f"❌ Error copying label {label_file}: {e}")
-                    
-                    # 통계 업데이트
-                    self.stats[f'{split_name}_images'] += 1
-                    self.stats['total_images'] += 1
+                if (i + 1) % 10 == 0 or i == len(jobs) - 1:
+                    print(f"   Progress: {i + 1}/{len(jobs)}")
+                if not success:
+                    print(msg)
+                    continue
+
+                # 매니페스트 / 통계 업데이트
+                src = Path(src)
+                split_name = splits[str(src)]
+                key = self._key(src)
+                image_hash, label_hash = self.pending.pop(key, None) or \
+                    hash_pair((str(src), str(src.with_suffix('.txt'))))
+                self.manifest[key] = dict(hash=image_hash, label_hash=label_hash, split=split_name,
+                                          resize=resize_size, stat=file_stat(src),
+                                          label_stat=file_stat(src.with_suffix('.txt')))
+                image_time += times['image']
+                label_time += times['label']
+                nbytes += size
+                self.stats[f'{split_name}_images'] += 1
+                self.stats['total_images'] += 1
+                self.stats['processed_images'] += 1
+
+        n = self.stats['processed_images']
+        self._throughput('process', n, time.perf_counter() - t, nbytes)
+        self._throughput('image_worker_time', n, image_time, nbytes)  # 워커 합산 시간 (코어당 처리량)
+        self._throughput('label_worker_time', n, label_time)
     
+    def pack_shards(self):
+        """
+        split 별로 shards/<split>/ 에 학습용 패킹 데이터 생성 (utils/dataloaders.py 의 LoadImagesAndLabelsShard 용)
+
+        images.bin: 인코딩된 이미지를 이어붙인 파일, index.npy: (n + 1,) 바이트 오프셋, shapes.npy: (n, 2) wh,
+        labels.npy: (m, 5) 전체 라벨, label_index.npy: (n + 1,) 이미지별 라벨 시작 행, files.txt: 파일 이름
+        """
+        print("\n📦 Packing shards...")
+        t, n_total, n_bytes = time.perf_counter(), 0, 0
+        for split_name in ['train', 'val', 'test']:
+            image_dir = self.output_dir / 'images' / split_name
+            images = sorted(p for p in image_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+            if not images:
+                continue
+            shard_dir = self.output_dir / 'shards' / split_name
+            shard_dir.mkdir(parents=True, exist_ok=True)
+
+            offsets, shapes, labels, label_index = [0], [], [], [0]
+            with open(shard_dir / 'images.bin', 'wb') as blob:
+                for image_path in images:
+                    offsets.append(offsets[-1] + blob.write(image_path.read_bytes()))
+                    shapes.append(image_size(image_path))
+                    lb = read_label_boxes(self._outputs(image_path, split_name)[1])
+                    labels.append(lb)
+                    label_index.append(label_index[-1] + len(lb))
+            np.save(shard_dir / 'index.npy', np.array(offsets, dtype=np.int64))
+            np.save(shard_dir / 'shapes.npy', np.array(shapes, dtype=np.int32).reshape(-1, 2))
+            np.save(shard_dir / 'labels.npy', np.concatenate(labels, 0))
+            np.save(shard_dir / 'label_index.npy', np.array(label_index, dtype=np.int64))
+            (shard_dir / 'files.txt').write_text('\n'.join(p.name for p in images) + '\n')
+
+            n_total += len(images)
+            n_bytes += offsets[-1]
+            print(f"✅ {shard_dir}: {len(images)} images, {label_index[-1]} labels, {offsets[-1] / 1e6:.1f} MB")
+        self._throughput('pack', n_total, time.perf_counter() - t, n_bytes)
+
     def generate_stats_report(self):
         """통계 리포트 생성"""
         report = {
@@ -198,11 +629,22 @@ class DatasetPreparer:
         print(f"   Train: {self.stats['train_images']}")
         print(f"   Validation: {self.stats['val_images']}")
         print(f"   Test: {self.stats['test_images']}")
+        print(f"   Processed: {self.stats['processed_images']}, Skipped (unchanged): {self.stats['skipped_images']}, "
+              f"Removed: {self.stats['removed_images']}")
+        if self.stats['duplicates']:
+            d = self.stats['duplicates']
+            print(f"\n🧬 Near-duplicates ({d['algorithm']}, radius {d['radius']}, {d['mode']}):")
+            print(f"   Clusters: {d['clusters']}, Redundant images: {d['redundant_images']}/{d['images_before']} "
+                  f"({d['shrink_percent']}%), Images kept: {d['images_after']}")
+        print(f"\n⏱️  Throughput:")
+        for stage, x in self.stats['throughput'].items():
+            mb = f", {x['MB_per_s']} MB/s" if x['MB_per_s'] else ""
+            print(f"   {stage}: {x['files']} files in {x['seconds']}s ({x['files_per_s']} files/s{mb})")
         print(f"\n💾 Report saved: {report_path}")
         print("="*50)
     
-    def prepare(self, resize_size=None):
-        """데이터셋 준비 실행"""
+    def prepare(self, resize_size=None, shards=False):
+        """데이터셋 준비 실행 (shards=True 면 split 별 패킹 파일도 생성)"""
         print("🚀 Starting Dataset Preparation")
         print("=" * 50)
         
@@ -211,24 +653,63 @@ class DatasetPreparer:
         
         # 2. 이미지 파일 찾기
         print("\n🔍 Finding image files...")
-        image_files = self.get_image_files()
+        t = time.perf_counter()
+        image_files = sorted(set(self.get_image_files()))
+        self._throughput('scan', len(image_files), time.perf_counter() - t)
         print(f"✅ Found {len(image_files)} images")
         
         if len(image_files) == 0:
             print("❌ No image files found!")
             return False
+
+        # 2-1. 유사 이미지 (연사) 클러스터
+        self.manifest = self.load_manifest()
+        clusters = None
+        if self.dedup:
+            print(f"\n🧬 Hashing images for near-duplicates ({self.dedup})...")
+            clusters = self.find_duplicates(image_files)
+            n_before, redundant = len(image_files), len(image_files) - len(clusters)
+            self.stats['duplicates'] = {
+                'algorithm': self.dedup,
+                'radius': self.dedup_radius,
+                'mode': self.dedup_mode,
+                'clusters': sum(len(c) > 1 for c in clusters),
+                'images_before': n_before,
+                'images_after': n_before,
+                'redundant_images': redundant,
+                'shrink_percent': round(100 * redundant / n_before, 1),
+            }
+            if self.dedup_mode == 'drop':  # 클러스터당 가장 큰 파일 1장만
+                image_files = sorted(max(c, key=lambda f: (os.path.getsize(f), str(f))) for c in clusters)
+                self.stats['duplicates']['images_after'] = len(image_files)
+                clusters = None
+            print(f"✅ {redundant} redundant images")
+
+        # 3. 변경된 이미지만 골라내기 (매니페스트)
+        print("\n🧾 Checking manifest for unchanged images...")
+        new_files, file_splits, n_skipped = self.find_changed(image_files, resize_size)
+        self.remove_stale(image_files)
+        print(f"   Unchanged: {n_skipped}, Changed: {sum(map(len, file_splits.values()))}, New: {len(new_files)}")
         
-        # 3. 데이터셋 분할
+        # 4. 데이터셋 분할 (새 이미지만, 기존 이미지는 split 유지)
         print("\n✂️  Splitting dataset...")
-        file_splits = self.split_dataset(image_files)
+        groups = self.group_by_cluster(new_files, clusters, file_splits) if clusters else None
+        for split_name, files in self.split_dataset(new_files, groups).items():
+            file_splits[split_name] += files
         print(f"   Train: {len(file_splits['train'])}")
         print(f"   Val: {len(file_splits['val'])}")
         print(f"   Test: {len(file_splits['test'])}")
         
-        # 4. 파일 복사 및 처리
-        self.copy_files(file_splits, resize_size)
+        # 5. 파일 복사 및 처리
+        try:
+            self.copy_files(file_splits, resize_size)
+        finally:
+            self.save_manifest()  # 중단돼도 처리된 이미지는 다음 실행에서 건너뛰기
+
+        if shards:
+            self.pack_shards()
         
-        # 5. 통계 리포트 생성
+        # 6. 통계 리포트 생성
         self.generate_stats_report()
         
         print("\n✅ Dataset preparation completed successfully!")
@@ -251,11 +732,16 @@ def main():
         output_dir=opt.output_dir,
         train_ratio=opt.train_ratio,
         val_ratio=opt.val_ratio,
-        test_ratio=opt.test_ratio
+        test_ratio=opt.test_ratio,
+        workers=opt.workers,
+        force=opt.force,
+        dedup=opt.dedup,
+        dedup_radius=opt.dedup_radius,
+        dedup_mode=opt.dedup_mode
     )
     
     resize_size = opt.resize if opt.resize > 0 else None
-    preparer.prepare(resize_size)
+    preparer.prepare(resize_size, shards=opt.shards)
 
 
 if __name__ == '__main__':
@@ -5,7 +5,16 @@
 - 비정상 케이블: 빨간색 박스
 """
 
+import argparse
+import glob
+import hashlib
+import json
+import math
+import queue
+import threading
+import time
 import cv2
+import numpy as np
 import torch
 from pathlib import Path
 import sys
@@ -16,12 +25,390 @@ ROOT = FILE.parent
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
+from utils.dataloaders import IMG_FORMATS
+
+
+def file_hash(path, chunk=1 << 20):
+    """가중치 파일 SHA256 (캐시 키)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_version():
+    """캐시된 모듈을 만드는 yolov5 코드 해시 (클래스 정의가 바뀌면 캐시 무효화)"""
+    h = hashlib.sha256()
+    for f in ('hubconf.py', 'models/common.py', 'models/yolo.py', 'models/experimental.py'):
+        h.update((ROOT / f).read_bytes())
+    return h.hexdigest()
+
+
+def hub_load(weights_path):
+    """torch.hub 로 모델 로드 (DetectionModel 생성 + Conv/BN fuse + AutoShape)"""
+    return torch.hub.load(str(ROOT), 'custom', path=weights_path, source='local')
+
+
+def load_model(weights_path, cache_dir='runs/model_cache'):
+    """
+    모델 로드 (빠른 재시작용 캐시 사용)
+
+    처음 한 번은 torch.hub 로 로드해서 결과 모듈을 통째로 저장하고,
+    이후에는 캐시 키가 같으면 저장된 eval 모듈을 mmap 으로 바로 읽는다.
+    캐시 키 = 가중치 경로 + 가중치 해시 + torch 버전 + yolov5 코드 해시.
+    캐시는 추론용 모듈만 담으므로 체크포인트의 optimizer / 학습 메타데이터는 포함되지 않는다.
+    캐시를 읽지 못하면 (깨진 파일, 코드/torch 불일치) 지우고 새로 만든다.
+    """
+    if not cache_dir:
+        return hub_load(weights_path)
+
+    h = hashlib.sha256()
+    for part in (str(Path(weights_path).resolve()), file_hash(weights_path), torch.__version__, code_version()):
+        h.update(part.encode())
+    cache_file = Path(cache_dir) / f"{Path(weights_path).stem}-{h.hexdigest()[:16]}.pt"
+    if cache_file.exists():
+        try:
+            try:
+                model = torch.load(cache_file, map_location='cpu', mmap=True, weights_only=False)
+            except TypeError:  # torch<2.1: mmap 미지원
+                model = torch.load(cache_file, map_location='cpu')
+            print(f"⚡ 캐시된 모델 사용: {cache_file}")
+            return model.to('cuda' if torch.cuda.is_available() else 'cpu').eval()
+        except Exception as e:
+            print(f"⚠️ 모델 캐시 로드 실패, 다시 생성합니다: {e}")
+            cache_file.unlink(missing_ok=True)
+
+    model = hub_load(weights_path)
+    device = next(model.parameters()).device
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix('.tmp')
+        torch.save(model.cpu().eval(), tmp)
+        tmp.replace(cache_file)  # 저장 중 종료되어도 깨진 캐시가 남지 않도록
+        print(f"💾 모델 캐시 저장: {cache_file}")
+    except Exception as e:
+        print(f"⚠️ 모델 캐시 저장 실패: {e}")
+    return model.to(device)
+
+
+def put_latest(q, item):
+    """큐가 가득 차 있으면 오래된 항목을 버리고 최신 항목만 넣기"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class AdaptiveSize:
+    """
+    추론 크기 자동 조절 (stride 배수 사다리, 예: 320/416/512/640)
+
+    측정한 추론 시간(지수이동평균)이 예산을 넘으면 한 단계 내리고,
+    한 단계 올려도 (면적 비례로 예측한 시간이) 예산의 headroom 비율 안에 들면 한 단계 올린다.
+    """
+
+    def __init__(self, budget_ms, ladder=(320, 416, 512, 640), stride=32, headroom=0.8, smooth=0.8, cooldown=10):
+        self.ladder = sorted({math.ceil(x / stride) * stride for x in ladder})
+        self.level = len(self.ladder) - 1  # 가장 큰 크기에서 시작
+        self.budget_ms = budget_ms
+        self.headroom = headroom
+        self.smooth = smooth  # 지연시간 지수이동평균 계수
+        self.cooldown = cooldown  # 크기 변경 후 N회는 측정만 (평균 안정화)
+        self.ema = None
+        self.wait = 0
+        self.changes = 0
+        self.counts = {x: 0 for x in self.ladder}  # 크기별 추론 횟수
+
+    @property
+    def size(self):
+        return self.ladder[self.level]
+
+    def update(self, latency_ms):
+        """이번 추론 시간을 반영해서 다음 추론 크기 결정"""
+        self.counts[self.size] += 1
+        self.ema = latency_ms if self.ema is None else self.smooth * self.ema + (1 - self.smooth) * latency_ms
+        if self.wait > 0:
+            self.wait -= 1
+            return self.size
+
+        level = self.level
+        if self.ema > self.budget_ms and level > 0:
+            level -= 1
+        elif level < len(self.ladder) - 1:
+            predicted = self.ema * (self.ladder[level + 1] / self.size) ** 2
+            if predicted < self.budget_ms * self.headroom:
+                level += 1
+        if level != self.level:
+            self.ema *= (self.ladder[level] / self.size) ** 2  # 새 크기 기준으로 예측값 보정
+            self.level = level
+            self.wait = self.cooldown
+            self.changes += 1
+        return self.size
+
+    def metrics(self):
+        return {
+            'size': self.size,
+            'budget_ms': self.budget_ms,
+            'latency_ema_ms': round(self.ema, 3) if self.ema is not None else None,
+            'changes': self.changes,
+            'inferences_per_size': {str(k): v for k, v in self.counts.items()},
+        }
+
+
+class ReplaySource:
+    """
+    녹화 영상 / 이미지 시퀀스(폴더, glob)를 카메라처럼 재생 (cv2.VideoCapture 대체, 헤드리스 벤치마크용)
+
+    fast=False 이면 녹화 FPS에 맞춰 재생하고, 처리가 늦어지면 실제 카메라처럼 밀린 프레임은 버린다.
+    fast=True 이면 모든 프레임을 최대한 빠르게 재생한다.
+    """
+
+    def __init__(self, path, fast=False, fps=30.0):
+        p = str(path)
+        if '*' in p:
+            self.files = sorted(glob.glob(p, recursive=True))
+        elif Path(p).is_dir():
+            self.files = sorted(str(f) for f in Path(p).iterdir())
+        else:
+            self.files = None
+        if self.files is None:
+            self.cap = cv2.VideoCapture(p)
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+        else:
+            self.files = [f for f in self.files if f.split('.')[-1].lower() in IMG_FORMATS]
+            self.cap = None
+            self.fps = fps
+        self.fast = fast
+        self.index = 0  # 다음에 읽을 프레임 번호
+        self.dropped = 0
+        self.t0 = None
+
+    def isOpened(self):
+        return bool(self.files) if self.cap is None else self.cap.isOpened()
+
+    def _skip(self):
+        """재생 시각 기준으로 이미 지나간 프레임 버리기 / 아직 이르면 대기"""
+        if self.t0 is None:
+            self.t0 = time.perf_counter()
+        due = int((time.perf_counter() - self.t0) * self.fps)  # 지금 보여야 할 프레임 번호
+        if due < self.index:
+            time.sleep((self.index - due) / self.fps)
+        while due > self.index:
+            if self.cap is not None and not self.cap.grab():
+                return False
+            self.index += 1
+            self.dropped += 1
+        return True
+
+    def grab(self):
+        if not self.fast and not self._skip():
+            return False
+        ok = self.cap.grab() if self.cap is not None else self.index < len(self.files)
+        if ok:
+            self.index += 1
+        return ok
+
+    def retrieve(self):
+        if self.cap is not None:
+            return self.cap.retrieve()
+        im = cv2.imread(self.files[self.index - 1])  # BGR
+        return im is not None, im
+
+    def read(self):
+        return self.retrieve() if self.grab() else (False, None)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class LatencyStats:
+    """단계별 지연시간 수집 (ms) -> 히스토그램 / 백분위 요약"""
+
+    bins = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))  # 히스토그램 구간 (ms)
+
+    def __init__(self, stages=('capture', 'preprocess', 'inference', 'nms', 'draw', 'total')):
+        self.samples = {k: [] for k in stages}
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds * 1000)
+
+    def summary(self):
+        out = {}
+        for k, v in self.samples.items():
+            if not v:
+                continue
+            x = np.array(v)
+            counts, _ = np.histogram(x, bins=self.bins)
+            out[k] = {
+                'count': len(x),
+                'mean': round(float(x.mean()), 3),
+                'p50': round(float(np.percentile(x, 50)), 3),
+                'p95': round(float(np.percentile(x, 95)), 3),
+                'p99': round(float(np.percentile(x, 99)), 3),
+                'max': round(float(x.max()), 3),
+                'histogram': {'bins_ms': [str(b) for b in self.bins], 'counts': counts.tolist()},
+            }
+        return out
+
+
+class MotionGate:
+    """축소 프레임 차분 + 히스테리시스로 장면 변화 감지 (정지 화면에서는 추론 생략)"""
+
+    def __init__(self, width=64, on_thresh=8.0, off_thresh=3.0, keepalive=30):
+        self.width = width  # 차분 계산용 축소 폭 (px)
+        self.on_thresh = on_thresh  # 이 값 이상이면 '변화 중'으로 전환
+        self.off_thresh = off_thresh  # 이 값 이하로 떨어져야 '정지'로 복귀
+        self.keepalive = keepalive  # 정지 상태에서도 N 프레임마다 한 번은 추론
+        self.refs = None  # 마지막 추론 시점의 축소 프레임 (카메라별)
+        self.moving = False
+        self.since_infer = 0
+        self.inferences = 0
+        self.skipped = 0
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, round(self.width * h / w))), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+
+    def should_infer(self, frames):
+        """이번 프레임(들)에 추론이 필요한지 판단하고 카운터 갱신"""
+        smalls = [self._small(f) for f in frames]
+        if self.refs is None or len(self.refs) != len(smalls):
+            run = True
+        else:
+            # 마지막 추론 프레임 대비 평균 밝기 차이 (카메라 중 최대값)
+            score = max(float(cv2.absdiff(a, b).mean()) for a, b in zip(smalls, self.refs))
+            was_moving = self.moving
+            self.moving = score > (self.off_thresh if was_moving else self.on_thresh)
+            # 변화 중 + 변화가 멈춘 직후 1회 + 주기적 keep-alive
+            run = self.moving or was_moving or self.since_infer + 1 >= self.keepalive
+
+        if run:
+            self.refs = smalls
+            self.since_infer = 0
+            self.inferences += 1
+        else:
+            self.since_infer += 1
+            self.skipped += 1
+        return run
+
+    def summary(self):
+        total = self.inferences + self.skipped
+        return f"추론 {self.inferences}회, 생략 {self.skipped}회 ({self.skipped / max(total, 1):.0%})"
+
+
+def box_iou(a, b):
+    """(n,4) x (m,4) xyxy 박스 IoU 행렬"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class ConnectorTracker:
+    """
+    커넥터 박스 IoU 트래커 (카메라 1대당 1개)
+
+    전체 프레임 탐지 사이에는 알려진 박스 위치를 등속 알파-베타 필터(정상상태 칼만 필터)로 예측하고,
+    예측 위치 주변 크롭만 다시 추론해서 박스와 신뢰도를 갱신한다.
+    """
+
+    def __init__(self, iou_thres=0.3, margin=0.5, max_misses=3, alpha=0.6, beta=0.2, smooth=0.7):
+        self.iou_thres = iou_thres  # 전체 탐지 <-> 트랙 매칭 IoU 기준
+        self.margin = margin  # 크롭 여유 (박스 크기 대비 비율, 각 방향)
+        self.max_misses = max_misses  # 연속으로 놓치면 트랙 삭제
+        self.alpha, self.beta = alpha, beta  # 위치 / 속도 보정 게인
+        self.smooth = smooth  # 신뢰도 지수이동평균 계수 (판정 안정화)
+        self.tracks = []  # dict(box, vel, conf, cls, misses)
+
+    def predict(self):
+        for t in self.tracks:
+            t['box'] = t['box'] + t['vel']
+
+    def _correct(self, t, box, conf):
+        r = box - t['box']
+        t['box'] = t['box'] + self.alpha * r
+        t['vel'] = t['vel'] + self.beta * r
+        t['conf'] = self.smooth * t['conf'] + (1 - self.smooth) * conf
+        t['misses'] = 0
+
+    def update(self, det):
+        """전체 프레임 탐지 결과 (n,6)로 트랙 매칭 / 생성 / 삭제"""
+        matched_t, matched_d = set(), set()
+        if self.tracks and len(det):
+            iou = box_iou(np.stack([t['box'] for t in self.tracks]), det[:, :4])
+            same_cls = np.array([t['cls'] for t in self.tracks])[:, None] == det[None, :, 5]
+            iou = np.where(same_cls, iou, 0)
+            for ti, di in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):  # greedy, IoU 높은 순
+                if iou[ti, di] < self.iou_thres:
+                    break
+                if ti in matched_t or di in matched_d:
+                    continue
+                self._correct(self.tracks[ti], det[di, :4], det[di, 4])
+                matched_t.add(ti)
+                matched_d.add(di)
+
+        for ti, t in enumerate(self.tracks):
+            if ti not in matched_t:
+                t['misses'] += 1
+        self.tracks = [t for t in self.tracks if t['misses'] <= self.max_misses]
+        for di, d in enumerate(det):
+            if di not in matched_d:
+                self.tracks.append(dict(box=d[:4].copy(), vel=np.zeros(4), conf=float(d[4]), cls=d[5], misses=0))
+
+    def crops(self, frame):
+        """예측 위치 주변 크롭과 원본 좌표 오프셋"""
+        h, w = frame.shape[:2]
+        crops, offsets = [], []
+        for t in self.tracks:
+            x1, y1, x2, y2 = t['box']
+            mx, my = max((x2 - x1) * self.margin, 16), max((y2 - y1) * self.margin, 16)
+            x1, y1 = int(max(x1 - mx, 0)), int(max(y1 - my, 0))
+            x2, y2 = int(min(x2 + mx, w)), int(min(y2 + my, h))
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                x1, y1, x2, y2 = 0, 0, w, h  # 화면 밖으로 나간 트랙은 전체 프레임으로
+            crops.append(frame[y1:y2, x1:x2])
+            offsets.append((x1, y1))
+        return crops, offsets
+
+    def update_crops(self, crop_dets, offsets):
+        """크롭별 탐지 결과로 각 트랙 갱신 (같은 클래스 우선, 가장 높은 신뢰도)"""
+        for t, det, (ox, oy) in zip(self.tracks, crop_dets, offsets):
+            if len(det):
+                same = det[det[:, 5] == t['cls']]
+                d = (same if len(same) else det)
+                d = d[d[:, 4].argmax()]
+                self._correct(t, d[:4] + np.array([ox, oy, ox, oy]), d[4])
+                t['cls'] = d[5]
+            else:
+                t['misses'] += 1
+                t['conf'] *= self.smooth
+        self.tracks = [t for t in self.tracks if t['misses'] <= self.max_misses]
+
+    def detections(self):
+        """현재 트랙을 (n,6) 탐지 형식으로 반환"""
+        if not self.tracks:
+            return np.zeros((0, 6), dtype=np.float32)
+        return np.array([[*t['box'], t['conf'], t['cls']] for t in self.tracks], dtype=np.float32)
+
+
 class RealTimeCableChecker:
-    def __init__(self, weights_path="runs/train/cable_check/weights/best.pt"):
+    def __init__(self, weights_path="runs/train/cable_check/weights/best.pt", sources=(0,), replay_fast=False,
+                 cache_dir='runs/model_cache'):
         print("🔌 실시간 케이블 체커 시작!")
         try:
-            self.model = torch.hub.load(str(ROOT), 'custom', path=weights_path, source='local', force_reload=True)
-            print("✅ AI 모델 로드 완료!")
+            t = time.perf_counter()
+            self.model = load_model(weights_path, cache_dir)
+            print(f"✅ AI 모델 로드 완료! ({time.perf_counter() - t:.2f}s)")
         except Exception as e:
             print(f"❌ 모델 로드 실패: {e}")
             sys.exit(1)
@@ -34,15 +421,106 @@ class RealTimeCableChecker:
         self.abnormal_color = (0, 0, 255)
         self.confidence_threshold = 0.7
         
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            print("❌ 카메라를 찾을 수 없어요!")
-            sys.exit(1)
-        print("📹 카메라 준비 완료! ('q' 또는 ESC로 종료)")
+        # 카메라 여러 대 (노트북 한 면당 한 대), 모델은 하나만 로드해서 배치 추론
+        self.caps = []
+        for source in sources:
+            # 녹화 파일 / 이미지 폴더 / glob 은 재생 소스로, 나머지는 카메라 / 스트림으로
+            replay = isinstance(source, str) and ('*' in source or Path(source).exists())
+            cap = ReplaySource(source, fast=replay_fast) if replay else cv2.VideoCapture(source)
+            if not cap.isOpened():
+                print(f"❌ 카메라를 찾을 수 없어요! ({source})")
+                sys.exit(1)
+            self.caps.append(cap)
+        self.cap = self.caps[0]
+        print(f"📹 카메라 {len(self.caps)}대 준비 완료! ('q' 또는 ESC로 종료)")
+
+        self.gate = None  # MotionGate, 설정 시 변화가 있을 때만 추론
+        self.last_results = None
+
+        self.trackers = None  # 카메라별 ConnectorTracker, 설정 시 K 프레임마다만 전체 탐지
+        self.full_every = 10
+        self.crop_size = 224
+        self.frame_idx = 0
+        self.model_times = [0.0, 0.0, 0.0]  # 이번 프레임의 전처리 / 추론 / NMS 시간 (s)
+        self.sizer = None  # AdaptiveSize, 설정 시 지연시간 예산에 맞춰 추론 크기 조절
+
+    def run_model(self, ims, **kwargs):
+        """모델 호출 + AutoShape 단계별 시간 누적"""
+        results = self.model(ims, **kwargs)
+        for i, dt in enumerate(results.times):
+            self.model_times[i] += dt.t
+        return results
+
+    def enable_adaptive_size(self, budget_ms, ladder=(320, 416, 512, 640)):
+        """지연시간 예산(ms)에 맞춰 추론 크기를 사다리에서 자동 선택"""
+        self.sizer = AdaptiveSize(budget_ms, ladder, stride=int(torch.as_tensor(self.model.stride).max()))
+
+    def detect(self, frames):
+        """전체 프레임 배치 추론 (적응형 크기 사용 시 측정 시간으로 다음 크기 조절)"""
+        if self.sizer is None:
+            return self.run_model(frames).xyxy
+        t = time.perf_counter()
+        results = self.run_model(frames, size=self.sizer.size)
+        self.sizer.update((time.perf_counter() - t) * 1000)
+        return results.xyxy
+
+    def enable_tracking(self, full_every=10, crop_size=224):
+        """전체 프레임 탐지는 full_every 프레임마다, 그 사이엔 트랙 크롭만 재추론"""
+        self.trackers = [ConnectorTracker() for _ in self.caps]
+        self.full_every = full_every
+        self.crop_size = crop_size
+
+    def infer(self, frames):
+        """카메라별 (n,6) 탐지 결과 리스트 반환 (모션 게이트가 있으면 변화 없을 때 직전 결과 재사용)"""
+        self.model_times = [0.0, 0.0, 0.0]
+        if self.gate is None or self.gate.should_infer(frames) or self.last_results is None:
+            if self.trackers is None:
+                self.last_results = [x.cpu().numpy() for x in self.detect(frames)]
+            else:
+                self.last_results = self.track(frames)
+        return self.last_results
 
-    def detect_and_draw(self, frame, results):
+    def track(self, frames):
+        """트래커 모드: K 프레임마다 전체 탐지, 그 사이엔 모든 카메라의 트랙 크롭을 한 배치로 재추론"""
+        crops, offsets, owners = [], [], []
+        full = self.frame_idx % self.full_every == 0
+        self.frame_idx += 1
+        if not full:
+            for i, (tracker, frame) in enumerate(zip(self.trackers, frames)):
+                tracker.predict()
+                c, o = tracker.crops(frame)
+                crops += c
+                offsets += o
+                owners += [i] * len(c)
+            full = not crops  # 추적 중인 커넥터가 없으면 전체 탐지
+
+        if full:
+            self.frame_idx = 1
+            for tracker, det in zip(self.trackers, self.detect(frames)):
+                tracker.update(det.cpu().numpy())
+        else:
+            crop_dets = [x.cpu().numpy() for x in self.run_model(crops, size=self.crop_size).xyxy]
+            for i, tracker in enumerate(self.trackers):
+                j = [k for k, owner in enumerate(owners) if owner == i]
+                tracker.update_crops([crop_dets[k] for k in j], [offsets[k] for k in j])
+        return [tracker.detections() for tracker in self.trackers]
+
+    def read_frames(self):
+        """모든 카메라에서 같은 시점의 프레임 읽기 (grab 먼저, retrieve 나중)"""
+        if not all(cap.grab() for cap in self.caps):
+            return None
+        frames = []
+        for cap in self.caps:
+            ret, frame = cap.retrieve()
+            if not ret:
+                return None
+            frames.append(frame)
+        return frames
+
+    def draw_detections(self, frame, det):
+        """(n,6) 탐지 결과를 프레임에 그리고 정상 여부 반환"""
         all_normal = True
-        for *box, conf, cls in results.xyxy[0].numpy():
+        for *box, conf, cls in det:
             if conf > 0.3:
                 x1, y1, x2, y2 = map(int, box)
                 class_id = int(cls)
@@ -61,36 +539,264 @@ class RealTimeCableChecker:
                 (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
                 cv2.rectangle(frame, (x1, y1-th-10), (x1+tw, y1), color, -1)
                 cv2.putText(frame, label, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
-        
+        return all_normal
+
+    def draw_verdict(self, frame, all_normal):
+        """화면 상단에 전체 판정 표시"""
         msg = "✅ 모든 케이블 정상" if all_normal else "⚠️ 비정상 케이블 감지!"
         msg_color = self.normal_color if all_normal else self.abnormal_color
         cv2.putText(frame, msg, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, msg_color, 3)
+
+    def detect_and_draw(self, frame, results, i=0):
+        all_normal = self.draw_detections(frame, results.xyxy[i].cpu().numpy())
+        self.draw_verdict(frame, all_normal)
         return frame
 
+    def render_station(self, frames, dets):
+        """카메라별 결과를 그리고 한 화면으로 합쳐 스테이션 전체 판정 표시"""
+        if len(frames) == 1:
+            frame = frames[0]
+            self.draw_verdict(frame, self.draw_detections(frame, dets[0]))
+            return frame
+
+        h = frames[0].shape[0]
+        tiles, station_normal = [], True
+        for i, frame in enumerate(frames):
+            cam_normal = self.draw_detections(frame, dets[i])
+            station_normal &= cam_normal
+            color = self.normal_color if cam_normal else self.abnormal_color
+            cv2.putText(frame, f"CAM {i}", (10, frame.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
+            if frame.shape[0] != h:
+                frame = cv2.resize(frame, (round(frame.shape[1] * h / frame.shape[0]), h))
+            tiles.append(frame)
+
+        station = cv2.hconcat(tiles)
+        self.draw_verdict(station, station_normal)
+        return station
+
+    def release(self):
+        for cap in self.caps:
+            cap.release()
+        cv2.destroyAllWindows()
+
     def run(self):
         print("🚀 실시간 케이블 체크 시작!")
         while True:
-            ret, frame = self.cap.read()
-            if not ret:
+            frames = self.read_frames()
+            if frames is None:
                 print("❌ 카메라 읽기 실패!")
                 break
             
-            results = self.model(frame)
-            frame = self.detect_and_draw(frame, results)
+            results = self.infer(frames)  # 카메라 N대 -> 배치 추론 1회
+            frame = self.render_station(frames, results)
+            self.draw_stats(frame)
             cv2.imshow('케이블 체크 시스템', frame)
             
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q') or key == 27:
                 break
         
-        self.cap.release()
-        cv2.destroyAllWindows()
+        self.release()
+        self.print_stats()
         print("👋 케이블 체크 시스템 종료!")
 
+    def benchmark(self, output=None, max_frames=0):
+        """헤드리스 벤치마크: 화면 없이 재생하며 단계별 지연시간 / FPS를 JSON으로 저장"""
+        print("⏱️ 헤드리스 벤치마크 시작!")
+        stats = LatencyStats()
+        n, t_start = 0, time.perf_counter()
+        while not max_frames or n < max_frames:
+            t0 = time.perf_counter()
+            frames = self.read_frames()
+            t1 = time.perf_counter()
+            if frames is None:
+                break
+            dets = self.infer(frames)
+            t2 = time.perf_counter()
+            self.render_station(frames, dets)
+            t3 = time.perf_counter()
+
+            n += 1
+            stats.add('capture', t1 - t0)
+            if any(self.model_times):  # 모션 게이트로 생략된 프레임은 모델 단계 없음
+                for k, dt in zip(('preprocess', 'inference', 'nms'), self.model_times):
+                    stats.add(k, dt)
+            stats.add('draw', t3 - t2)
+            stats.add('total', t3 - t0)
+        elapsed = time.perf_counter() - t_start
+        self.release()
+
+        report = {
+            'sources': len(self.caps),
+            'frames': n,
+            'elapsed_s': round(elapsed, 3),
+            'fps': round(n / elapsed, 2) if elapsed > 0 else 0.0,
+            'dropped_frames': sum(getattr(cap, 'dropped', 0) for cap in self.caps),
+            'stages_ms': stats.summary(),
+        }
+        if self.gate is not None:
+            report['motion_gate'] = {'inferences': self.gate.inferences, 'skipped': self.gate.skipped}
+        if self.sizer is not None:
+            report['adaptive_size'] = self.sizer.metrics()
+        if output:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 벤치마크 결과 저장: {output}")
+        else:
+            print(json.dumps(report, indent=2))
+        total = report['stages_ms'].get('total', {})
+        print(f"⏱️ {n} 프레임, {report['fps']} FPS, total p50 {total.get('p50')}ms / p95 {total.get('p95')}ms")
+        return report
+
+    def draw_stats(self, frame):
+        """모션 게이트 / 적응형 크기 상태를 화면에 표시"""
+        texts = []
+        if self.gate is not None:
+            texts.append(f"skip {self.gate.skipped}/{self.gate.skipped + self.gate.inferences}")
+        if self.sizer is not None:
+            texts.append(f"size {self.sizer.size}")
+        for i, text in enumerate(texts):
+            cv2.putText(frame, text, (10, 110 + 30 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    def print_stats(self):
+        if self.gate is not None:
+            print(f"💤 모션 게이트: {self.gate.summary()}")
+        if self.sizer is not None:
+            m = self.sizer.metrics()
+            print(f"📐 추론 크기: 현재 {m['size']}, 변경 {m['changes']}회, 크기별 추론 {m['inferences_per_size']}")
+
+    def _capture_loop(self, cap, frames, latest, i, new_frame, stop):
+        """캡처 스레드 (카메라당 1개): 프레임을 읽어 추론용 최신 프레임 큐와 화면 표시용 최신 프레임 슬롯에 넣기"""
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                print("❌ 카메라 읽기 실패!")
+                stop.set()
+                break
+            item = (time.perf_counter(), frame)
+            put_latest(frames, item)
+            latest[i] = item
+            new_frame.set()
+
+    def _inference_loop(self, frames, results, stop):
+        """추론 스레드: 카메라별 최신 프레임을 모아 배치 추론"""
+        while not stop.is_set():
+            batch = []
+            for q in frames:
+                while not stop.is_set():
+                    try:
+                        batch.append(q.get(timeout=0.1))
+                        break
+                    except queue.Empty:
+                        continue
+            if len(batch) < len(frames):
+                break
+            t_cap = min(t for t, _ in batch)  # 배치에서 가장 오래된 프레임 기준
+            put_latest(results, (t_cap, self.infer([im for _, im in batch])))
+
+    def run_pipelined(self):
+        """
+        캡처 / 추론 / 화면 표시를 분리한 파이프라인 모드
+
+        화면은 추론을 기다리지 않고 새 프레임이 캡처될 때마다 다시 그리고, 그 위에 가장 최근 추론 결과를 겹쳐 표시한다.
+        """
+        print("🚀 실시간 케이블 체크 시작! (파이프라인 모드)")
+        frames = [queue.Queue(maxsize=1) for _ in self.caps]
+        latest = [None] * len(self.caps)  # 카메라별 최신 (캡처 시각, 프레임)
+        results = queue.Queue(maxsize=1)
+        new_frame, stop = threading.Event(), threading.Event()
+        workers = [threading.Thread(target=self._capture_loop, args=(cap, q, latest, i, new_frame, stop), daemon=True)
+                   for i, (cap, q) in enumerate(zip(self.caps, frames))]
+        workers.append(threading.Thread(target=self._inference_loop, args=(frames, results, stop), daemon=True))
+        for t in workers:
+            t.start()
+
+        n, latency_sum, latency_max, t_start = 0, 0.0, 0.0, time.perf_counter()
+        t_det, dets = None, None  # 화면에 겹쳐 그리는 최근 추론 결과
+        while not stop.is_set():
+            # 화면 표시는 메인 스레드에서 (cv2.imshow 제약)
+            if not new_frame.wait(timeout=0.1):
+                if cv2.waitKey(1) & 0xFF in (ord('q'), 27):
+                    break
+                continue
+            new_frame.clear()
+            try:
+                t_det, dets = results.get_nowait()
+            except queue.Empty:
+                pass  # 새 추론 결과가 없으면 직전 결과를 유지
+            snapshot = list(latest)
+            if dets is None or None in snapshot:  # 첫 추론 결과 / 모든 카메라 프레임 대기
+                if cv2.waitKey(1) & 0xFF in (ord('q'), 27):
+                    break
+                continue
+
+            t_cap = min(t for t, _ in snapshot)
+            frame = self.render_station([im.copy() for _, im in snapshot], dets)  # 추론 스레드가 읽는 중일 수 있어 복사
+            now = time.perf_counter()
+            latency = (now - t_cap) * 1000  # ms, 캡처 -> 화면 표시
+            n += 1
+            latency_sum += latency
+            latency_max = max(latency_max, latency)
+            text = f"latency {latency:.0f}ms, det age {(now - t_det) * 1000:.0f}ms"
+            cv2.putText(frame, text, (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            self.draw_stats(frame)
+            cv2.imshow('케이블 체크 시스템', frame)
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q') or key == 27:
+                break
+
+        stop.set()
+        for t in workers:
+            t.join(timeout=1.0)
+        self.release()
+
+        if n:
+            elapsed = time.perf_counter() - t_start
+            print(f"⏱️ 표시 프레임: {n}, 평균 FPS: {n / elapsed:.1f}")
+            print(f"⏱️ 프레임 지연시간: 평균 {latency_sum / n:.1f}ms, 최대 {latency_max:.1f}ms")
+        self.print_stats()
+        print("👋 케이블 체크 시스템 종료!")
+
+
+def parse_opt():
+    """명령행 인자 파싱"""
+    parser = argparse.ArgumentParser(description='실시간 케이블 체크')
+    parser.add_argument('--weights', type=str, default='runs/train/cable_check/weights/best.pt', help='model path')
+    parser.add_argument('--model-cache', type=str, default='runs/model_cache', help='fuse 완료 모델 캐시 폴더 (빈 값이면 사용 안 함)')
+    parser.add_argument('--source', nargs='+', default=['0'], help='카메라 번호 또는 스트림 주소 (여러 개 가능)')
+    parser.add_argument('--pipeline', action='store_true', help='캡처/추론/표시 스레드 분리 (최신 프레임만 처리)')
+    parser.add_argument('--motion-gate', action='store_true', help='화면 변화가 있을 때만 추론 (정지 시 직전 결과 재사용)')
+    parser.add_argument('--track-every', type=int, default=0, help='N>0: N 프레임마다만 전체 탐지, 그 사이엔 커넥터 트래킹 + 크롭 재추론')
+    parser.add_argument('--crop-size', type=int, default=224, help='트래킹 크롭 재추론 크기 (pixels)')
+    parser.add_argument('--benchmark', type=str, default='', help='헤드리스 벤치마크 결과 JSON 경로 (녹화 영상/이미지 폴더를 --source 로)')
+    parser.add_argument('--replay-fast', action='store_true', help='녹화 소스를 녹화 FPS 대신 최대한 빠르게 재생')
+    parser.add_argument('--max-frames', type=int, default=0, help='벤치마크 최대 프레임 수 (0=끝까지)')
+    parser.add_argument('--latency-budget', type=float, default=0, help='ms>0: 추론 시간 예산에 맞춰 추론 크기 자동 조절')
+    parser.add_argument('--size-ladder', nargs='+', type=int, default=[320, 416, 512, 640], help='적응형 추론 크기 후보')
+    parser.add_argument('--keepalive', type=int, default=30, help='모션 게이트 사용 시 N 프레임마다 강제 추론')
+    return parser.parse_args()
+
+
 def main():
+    opt = parse_opt()
     try:
-        checker = RealTimeCableChecker()
-        checker.run()
+        sources = [int(x) if x.isnumeric() else x for x in opt.source]
+        checker = RealTimeCableChecker(opt.weights, sources, replay_fast=opt.replay_fast,
+                                       cache_dir=opt.model_cache)
+        if opt.latency_budget > 0:
+            checker.enable_adaptive_size(opt.latency_budget, opt.size_ladder)
+        if opt.track_every > 0:
+            checker.enable_tracking(opt.track_every, opt.crop_size)
+        if opt.motion_gate:
+            checker.gate = MotionGate(keepalive=opt.keepalive)
+        if opt.benchmark:
+            checker.benchmark(opt.benchmark, opt.max_frames)
+        elif opt.pipeline:
+            checker.run_pipelined()
+        else:
+            checker.run()
     except KeyboardInterrupt:
         print("\n⚡ 강제 종료!")
     except Exception as e:
@@ -6,12 +6,62 @@
 
 import cv2
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from PIL import Image
+
+MAX_DISPLAY = 1280  # 화면 표시용 이미지 최대 변 길이 (px)
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+PROPOSAL_DIR = 'proposals'  # prelabel.py 가 만든 라벨 후보 폴더 (이미지 폴더 안)
+
+
+def find_images(folder):
+    """라벨링할 이미지 목록 (prelabel.py 와 같은 기준)"""
+    image_files = []
+    for ext in IMAGE_EXTENSIONS:
+        image_files.extend(Path(folder).glob(f'*{ext}'))
+    return image_files
+
+
+def read_labels(label_path):
+    """YOLO 라벨 파일 -> [[class, x, y, w, h], ...]"""
+    labels = []
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) == 5:
+                labels.append([int(parts[0]), float(parts[1]), float(parts[2]), float(parts[3]), float(parts[4])])
+    return labels
+
+
+def read_display_image(path, max_size=MAX_DISPLAY):
+    """
+    화면 표시용 축소 이미지 읽기
+
+    큰 사진(12MP 등)은 JPEG 축소 디코딩(1/2, 1/4, 1/8)으로 먼저 줄여 읽고, 남은 배율만 resize 한다.
+    """
+    with Image.open(path) as img:
+        size = max(img.size)  # 헤더만 읽음 (회전과 무관한 긴 변)
+    flags = cv2.IMREAD_COLOR
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if size / factor >= max_size:
+            flags = flag
+            break
+    image = cv2.imread(str(path), flags)
+    if image is None:
+        return None
+    r = max_size / max(image.shape[:2])
+    if r < 1:
+        image = cv2.resize(image, (round(image.shape[1] * r), round(image.shape[0] * r)), interpolation=cv2.INTER_AREA)
+    return image
+
 
 class SimpleCableLabeler:
-    def __init__(self, image_folder):
+    def __init__(self, image_folder, max_display=MAX_DISPLAY):
         self.image_folder = Path(image_folder)
-        self.current_image = None
+        self.max_display = max_display
+        self.current_image = None  # 화면 표시용 축소 이미지 (라벨은 정규화 좌표라 원본 해상도 불필요)
         self.current_image_path = None
         self.image_files = []
         self.current_index = 0
@@ -24,10 +74,15 @@ class SimpleCableLabeler:
             '8': 'battery', '9': 'touchpad', '10': 'keyboard', '11': 'speaker'
         }
         self.current_class = 0
+        self.from_proposal = False  # 현재 라벨이 아직 저장 안 된 모델 후보인지
+        self.edited = False  # 현재 이미지에서 박스를 추가 / 삭제했는지
+        self.drag_start = None  # 드래그로 박스 그리기 시작점
+        self.dirty = True  # 라벨 / 클래스 / 이미지가 바뀌었을 때만 다시 그리기
+        self.prefetch = {}  # 인덱스 -> 백그라운드 디코딩 Future (이전 / 다음 이미지)
+        self.executor = ThreadPoolExecutor(max_workers=2)
         
         # 이미지 파일 찾기
-        for ext in ['.jpg', '.jpeg', '.png']:
-            self.image_files.extend(list(self.image_folder.glob(f'*{ext}')))
+        self.image_files = find_images(self.image_folder)
         
         if not self.image_files:
             print("❌ 이미지 파일이 없어요!")
@@ -43,42 +98,70 @@ class SimpleCableLabeler:
             return False
             
         self.current_image_path = self.image_files[self.current_index]
-        self.current_image = cv2.imread(str(self.current_image_path))
+        future = self.prefetch.pop(self.current_index, None)
+        self.current_image = future.result() if future else read_display_image(self.current_image_path,
+                                                                                 self.max_display)
         self.labels = []
+        self.edited = False
+        self.dirty = True
+        self.prefetch_neighbors()
         
-        # 기존 라벨 파일 로드 (있다면)
+        # 기존 라벨 파일 로드 (있다면), 없으면 prelabel.py 후보 로드
         label_path = self.current_image_path.with_suffix('.txt')
+        proposal_path = self.image_folder / PROPOSAL_DIR / label_path.name
+        self.from_proposal = not label_path.exists() and proposal_path.exists()
         if label_path.exists():
-            with open(label_path, 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) == 5:
-                        self.labels.append([int(parts[0]), float(parts[1]), 
-                                          float(parts[2]), float(parts[3]), float(parts[4])])
+            self.labels = read_labels(label_path)
+        elif self.from_proposal:
+            self.labels = read_labels(proposal_path)
         
         print(f"\n📷 이미지: {self.current_image_path.name} ({self.current_index+1}/{len(self.image_files)})")
+        if self.from_proposal:
+            print(f"🤖 모델 후보 {len(self.labels)}개 로드 (그대로 쓰려면 's'로 수락, 수정하면 이동 시 저장)")
         print(f"현재 클래스: {self.current_class} ({self.classes[str(self.current_class)]})")
         print("사용법:")
-        print("- 마우스로 케이블 클릭해서 박스 그리기")
+        print("- 마우스로 클릭 또는 드래그해서 박스 그리기, 오른쪽 클릭: 박스 삭제")
         print("- 숫자키 0-9: 클래스 변경")
-        print("- 's': 저장, 'n': 다음 이미지, 'q': 종료")
+        print("- 's': 저장, 'n': 다음 이미지, 'p': 이전 이미지, 'q': 종료")
         return True
 
+    def prefetch_neighbors(self):
+        """이전 / 다음 이미지를 백그라운드 스레드에서 미리 디코딩 ('n', 'p' 즉시 전환)"""
+        wanted = {i for i in (self.current_index - 1, self.current_index + 1) if 0 <= i < len(self.image_files)}
+        for i in list(self.prefetch):
+            if i not in wanted:
+                self.prefetch.pop(i).cancel()
+        for i in wanted - self.prefetch.keys():
+            self.prefetch[i] = self.executor.submit(read_display_image, self.image_files[i], self.max_display)
+
     def mouse_callback(self, event, x, y, flags, param):
-        """마우스 클릭 이벤트"""
+        """마우스 이벤트: 클릭 / 드래그로 박스 추가, 오른쪽 클릭으로 삭제"""
+        h, w = self.current_image.shape[:2]
         if event == cv2.EVENT_LBUTTONDOWN:
-            # 클릭한 위치에 작은 박스 추가 (간단하게)
-            h, w = self.current_image.shape[:2]
-            
-            # 정규화된 좌표 (YOLO 형식)
-            x_center = x / w
-            y_center = y / h
-            box_w = 0.1  # 기본 박스 크기
-            box_h = 0.1
+            self.drag_start = (x, y)
+        
+        elif event == cv2.EVENT_LBUTTONUP and self.drag_start:
+            (x0, y0), self.drag_start = self.drag_start, None
+            if abs(x - x0) > 5 and abs(y - y0) > 5:  # 드래그한 영역을 박스로
+                x_center, y_center = (x0 + x) / 2 / w, (y0 + y) / 2 / h
+                box_w, box_h = abs(x - x0) / w, abs(y - y0) / h
+            else:  # 클릭한 위치에 작은 박스 추가 (간단하게)
+                x_center, y_center = x / w, y / h
+                box_w = 0.1  # 기본 박스 크기
+                box_h = 0.1
             
             self.labels.append([self.current_class, x_center, y_center, box_w, box_h])
             print(f"✅ {self.classes[str(self.current_class)]} 추가됨!")
-            self.draw_labels()
+            self.edited = self.dirty = True
+        
+        elif event == cv2.EVENT_RBUTTONDOWN:
+            # 클릭 위치를 포함하는 가장 작은 박스 삭제 (후보 수정용)
+            hits = [i for i, (_, xc, yc, bw, bh) in enumerate(self.labels)
+                    if abs(x / w - xc) <= bw / 2 and abs(y / h - yc) <= bh / 2]
+            if hits:
+                i = min(hits, key=lambda i: self.labels[i][3] * self.labels[i][4])
+                print(f"🗑️ {self.classes[str(self.labels.pop(i)[0])]} 삭제됨!")
+                self.edited = self.dirty = True
 
     def draw_labels(self):
         """라벨들을 화면에 그리기"""
@@ -94,8 +177,8 @@ class SimpleCableLabeler:
             x2 = int((x_center + box_w/2) * w)
             y2 = int((y_center + box_h/2) * h)
             
-            # 모든 정상 상태는 초록색
-            color = (0, 255, 0)
+            # 모든 정상 상태는 초록색 (저장 전 모델 후보는 주황색)
+            color = (0, 165, 255) if self.from_proposal else (0, 255, 0)
             
             # 박스 그리기
             cv2.rectangle(display_img, (x1, y1), (x2, y2), color, 2)
@@ -107,10 +190,11 @@ class SimpleCableLabeler:
                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
         
         cv2.imshow('케이블 라벨링', display_img)
+        self.dirty = False
 
     def save_labels(self):
-        """라벨 저장"""
-        if not self.labels:
+        """라벨 저장 (박스를 모두 지웠거나 빈 후보를 수락하면 빈 파일 = 검토된 배경 이미지)"""
+        if not self.labels and not (self.edited or self.from_proposal):
             print("저장할 라벨이 없어요!")
             return
             
@@ -119,8 +203,17 @@ class SimpleCableLabeler:
             for label in self.labels:
                 f.write(f"{label[0]} {label[1]:.6f} {label[2]:.6f} {label[3]:.6f} {label[4]:.6f}\n")
         
+        self.from_proposal = False
+        self.dirty = True
         print(f"💾 저장됨: {label_path}")
 
+    def save_on_leave(self):
+        """이미지 이동 시 저장 (손대지 않은 모델 후보는 검토 전이므로 저장하지 않음)"""
+        if self.from_proposal and not self.edited:
+            print("⏭️ 검토하지 않은 모델 후보는 저장하지 않아요 ('s'로 수락)")
+            return
+        self.save_labels()
+
     def run(self):
         """라벨링 시작"""
         if not self.image_files:
@@ -130,26 +223,36 @@ class SimpleCableLabeler:
         cv2.setMouseCallback('케이블 라벨링', self.mouse_callback)
         
         while True:
-            self.draw_labels()
-            key = cv2.waitKey(1) & 0xFF
+            if self.dirty:
+                self.draw_labels()
+            key = cv2.waitKey(15) & 0xFF
             
             # 숫자키로 클래스 변경
             if key >= ord('0') and key <= ord('9'):
                 self.current_class = key - ord('0')
+                self.dirty = True
                 print(f"클래스 변경: {self.classes[str(self.current_class)]}")
             
             elif key == ord('s'):  # 저장
                 self.save_labels()
             
             elif key == ord('n'):  # 다음 이미지
-                self.save_labels()
+                self.save_on_leave()
                 self.current_index += 1
                 if not self.load_image():
                     break
             
+            elif key == ord('p') and self.current_index > 0:  # 이전 이미지
+                self.save_on_leave()
+                self.current_index -= 1
+                self.load_image()
+            
             elif key == ord('q'):  # 종료
                 break
         
+        for future in self.prefetch.values():  # 아직 시작 안 한 미리 읽기 취소 (cancel_futures 는 3.9+)
+            future.cancel()
+        self.executor.shutdown(wait=False)
         cv2.destroyAllWindows()
         print("👋 라벨링 완료!")
 
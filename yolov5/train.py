@@ -49,6 +49,7 @@ from ultralytics.utils.patches import torch_load
 import val as validate  # for end-of-epoch mAP
 from models.experimental import attempt_load
 from models.yolo import Model
+from utils.augmentations import BatchAugment
 from utils.autoanchor import check_anchors
 from utils.autobatch import check_train_batch_size
 from utils.callbacks import Callbacks
@@ -301,7 +302,13 @@ def train(hyp, opt, device, callbacks):
         prefix=colorstr("train: "),
         shuffle=True,
         seed=opt.seed,
+        cache_budget=opt.cache_budget,
+        cache_policy=opt.cache_policy,
+        cache_codec=opt.cache_codec,
+        batch_augment=opt.augment_batch,
+        decode_cache=opt.decode_cache,
     )
+    batch_augment = BatchAugment(hyp) if opt.augment_batch else None  # HSV and flips on whole batches
     labels = np.concatenate(dataset.labels, 0)
     mlc = int(labels[:, 0].max())  # max label class
     assert mlc < nc, f"Label class {mlc} exceeds nc={nc} in {data}. Possible class labels are 0-{nc - 1}"
@@ -389,7 +396,10 @@ def train(hyp, opt, device, callbacks):
         for i, (imgs, targets, paths, _) in pbar:  # batch -------------------------------------------------------------
             callbacks.run("on_train_batch_start")
             ni = i + nb * epoch  # number integrated batches (since train start)
-            imgs = imgs.to(device, non_blocking=True).float() / 255  # uint8 to float32, 0-255 to 0.0-1.0
+            if batch_augment:  # HSV and flips on the uint8 batch, returns float32 0.0-1.0
+                imgs, targets = batch_augment(imgs.to(device, non_blocking=True), targets)
+            else:
+                imgs = imgs.to(device, non_blocking=True).float() / 255  # uint8 to float32, 0-255 to 0.0-1.0
 
             # Warmup
             if ni <= nw:
@@ -450,6 +460,9 @@ def train(hyp, opt, device, callbacks):
         lr = [x["lr"] for x in optimizer.param_groups]  # for loggers
         scheduler.step()
 
+        if RANK in {-1, 0} and (s := dataset.cache_report()):  # RAM cache hit rate this epoch
+            LOGGER.info(s)
+
         if RANK in {-1, 0}:
             # mAP
             callbacks.run("on_train_epoch_end", epoch=epoch)
@@ -586,7 +599,14 @@ def parse_opt(known=False):
     parser.add_argument("--resume_evolve", type=str, default=None, help="resume evolve from last generation")
     parser.add_argument("--bucket", type=str, default="", help="gsutil bucket")
     parser.add_argument("--cache", type=str, nargs="?", const="ram", help="image --cache ram/disk")
+    parser.add_argument("--cache-budget", type=float, default=None, help="max GB for --cache ram, default all free RAM")
+    parser.add_argument(
+        "--cache-policy", type=str, choices=["pin", "lru"], default="pin", help="--cache ram policy when over budget"
+    )
+    parser.add_argument("--decode-cache", type=float, default=0.0, help="GB of decoded images to reuse without --cache")
+    parser.add_argument("--cache-codec", choices=["raw", "png", "jpg"], default="raw", help="--cache disk image codec")
     parser.add_argument("--image-weights", action="store_true", help="use weighted image selection for training")
+    parser.add_argument("--augment-batch", action="store_true", help="HSV and flip augment whole batches in torch")
     parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
     parser.add_argument("--multi-scale", action="store_true", help="vary img-size +/- 50%%")
     parser.add_argument("--single-cls", action="store_true", help="train multi-class data as single-class")
@@ -943,7 +963,17 @@ def run(**kwargs):
         resume_evolve (str, optional): Resume hyperparameter evolution from the last generation. Defaults to None.
         bucket (str, optional): gsutil bucket for saving checkpoints. Defaults to an empty string.
         cache (str, optional): Cache image data in 'ram' or 'disk'. Defaults to None.
+        cache_budget (float, optional): Max GB of RAM for `cache='ram'`, partially caching larger datasets. Defaults to
+            None (available memory).
+        cache_policy (str, optional): RAM cache policy when over budget, 'pin' (fixed subset, most sampled first under
+            image_weights) or 'lru'. Defaults to 'pin'.
+        decode_cache (float, optional): GB of recently decoded images kept in per-worker LRU caches when not caching
+            in RAM, so mosaic and mixup decode repeated images less often. Defaults to 0.0 (disabled).
+        cache_codec (str, optional): Codec of `cache='disk'` images resized to imgsz, 'raw' (*.npy), 'png' or 'jpg'.
+            Defaults to 'raw'.
         image_weights (bool, optional): Use weighted image selection for training. Defaults to False.
+        augment_batch (bool, optional): Apply HSV and flip augmentation to whole batches in torch after collate instead
+            of per image in the dataloader workers. Defaults to False.
         device (str, optional): CUDA device identifier, e.g., '0', '0,1,2,3', or 'cpu'. Defaults to an empty string.
         multi_scale (bool, optional): Use multi-scale training, varying image size by ±50%. Defaults to False.
         single_cls (bool, optional): Train with multi-class data as single-class. Defaults to False.
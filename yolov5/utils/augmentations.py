@@ -158,13 +158,27 @@ def random_perspective(
     # torchvision.transforms.RandomAffine(degrees=(-10, 10), translate=(0.1, 0.1), scale=(0.9, 1.1), shear=(-10, 10))
     # targets = [cls, xyxy]
     """Applies random perspective transformation to an image, modifying the image and corresponding labels."""
-    height = im.shape[0] + border[0] * 2  # shape(h,w,c)
-    width = im.shape[1] + border[1] * 2
+    M, s, (width, height) = random_perspective_matrix(im.shape, degrees, translate, scale, shear, perspective, border)
+    if (border[0] != 0) or (border[1] != 0) or (M != np.eye(3)).any():  # image changed
+        if perspective:
+            im = cv2.warpPerspective(im, M, dsize=(width, height), borderValue=(114, 114, 114))
+        else:  # affine
+            im = cv2.warpAffine(im, M[:2], dsize=(width, height), borderValue=(114, 114, 114))
+
+    return im, warp_targets(targets, segments, M, s, width, height, perspective)
+
+
+def random_perspective_matrix(shape, degrees=10, translate=0.1, scale=0.1, shear=10, perspective=0.0, border=(0, 0)):
+    """Returns a random 3x3 perspective matrix for an image of `shape` (h, w), its scale gain and the (width, height)
+    of the output.
+    """
+    height = shape[0] + border[0] * 2  # shape(h,w,c)
+    width = shape[1] + border[1] * 2
 
     # Center
     C = np.eye(3)
-    C[0, 2] = -im.shape[1] / 2  # x translation (pixels)
-    C[1, 2] = -im.shape[0] / 2  # y translation (pixels)
+    C[0, 2] = -shape[1] / 2  # x translation (pixels)
+    C[1, 2] = -shape[0] / 2  # y translation (pixels)
 
     # Perspective
     P = np.eye(3)
@@ -191,12 +205,13 @@ def random_perspective(
 
     # Combined rotation matrix
     M = T @ S @ R @ P @ C  # order of operations (right to left) is IMPORTANT
-    if (border[0] != 0) or (border[1] != 0) or (M != np.eye(3)).any():  # image changed
-        if perspective:
-            im = cv2.warpPerspective(im, M, dsize=(width, height), borderValue=(114, 114, 114))
-        else:  # affine
-            im = cv2.warpAffine(im, M[:2], dsize=(width, height), borderValue=(114, 114, 114))
+    return M, s, (width, height)
+
 
+def warp_targets(targets, segments, M, s, width, height, perspective=0.0):
+    """Transforms [cls, xyxy] `targets` (or their `segments` if given) by matrix `M` with scale gain `s`, clips them to
+    the (width, height) output and drops boxes that became too small or thin.
+    """
     if n := len(targets):
         use_segments = any(x.any() for x in segments) and len(segments) == n
         new = np.zeros((n, 4))
@@ -231,7 +246,70 @@ def random_perspective(
         targets = targets[i]
         targets[:, 1:5] = new[i]
 
-    return im, targets
+    return targets
+
+
+def tile_owners(xyxys, M, dsize):
+    """
+    Returns the (h, w) uint8 map of which mosaic tile covers each output pixel, 1 + tile index or 0 for background.
+
+    Tiles `xyxys` are canvas rectangles transformed by `M` into an output of wh `dsize`. Each tile is rasterized as
+    its transformed canvas area. All outlines are drawn before the fills, so edge pixels that the polygon fill leaves
+    out still belong to a tile and the union of the tiles has no gaps.
+    """
+    owners = np.zeros(dsize[::-1], dtype=np.uint8)
+    polygons = []
+    for k, (x1a, y1a, x2a, y2a) in enumerate(xyxys, 1):
+        if x2a > x1a and y2a > y1a:
+            xy = np.array([[x1a, y1a, 1], [x2a, y1a, 1], [x2a, y2a, 1], [x1a, y2a, 1]]) - [0.5, 0.5, 0]  # pixel edges
+            xy = xy @ M.T
+            polygons.append((k, np.round(xy[:, :2] / xy[:, 2:3] * 256).astype(np.int32)))  # 8 fractional bits
+    for k, xy in polygons:
+        cv2.polylines(owners, [xy], True, k, thickness=3, shift=8)
+    for k, xy in polygons:
+        cv2.fillPoly(owners, [xy], k, shift=8)
+    return owners
+
+
+def warp_tile(dst, im, xyxy_a, xyxy_b, hw, M, mask, perspective=0.0):
+    """
+    Warps a mosaic tile once, straight into the final output `dst` (in place), instead of pasting it into the 2x mosaic
+    canvas and warping the whole canvas.
+
+    The tile is the xyxy_b crop of image `im` resized to `hw`, placed at xyxy_a of the canvas, and the canvas is then
+    transformed by `M`. `im` may be larger than `hw` (not yet resized), the resize is composed into the same warp. Only
+    output pixels in boolean `mask` (the tile's pixels in tile_owners()) are written. The crop keeps a 2 pixel margin
+    of neighbouring image content, replicated at image edges, so pixels along tile edges are fully interpolated.
+    """
+    (x1a, y1a, x2a, y2a), (x1b, y1b, x2b, y2b) = xyxy_a, xyxy_b
+    if x2a <= x1a or y2a <= y1a:  # tile outside the canvas
+        return
+    gx, gy = im.shape[1] / hw[1], im.shape[0] / hw[0]  # image pixels per resized pixel
+    mx, my = math.ceil(2 * gx), math.ceil(2 * gy)  # crop margin in image pixels
+    x1, y1 = max(math.floor(x1b * gx) - mx, 0), max(math.floor(y1b * gy) - my, 0)  # crop in image pixels
+    x2, y2 = min(math.ceil(x2b * gx) + mx, im.shape[1]), min(math.ceil(y2b * gy) + my, im.shape[0])
+
+    # Crop pixel -> resized tile pixel (pixel centers as cv2.resize) -> canvas -> output
+    ox = (x1 + 0.5) / gx - 0.5 + x1a - x1b  # crop origin on the canvas
+    oy = (y1 + 0.5) / gy - 0.5 + y1a - y1b
+    A = M @ np.array([[1 / gx, 0, ox], [0, 1 / gy, oy], [0, 0, 1]])
+
+    # Only warp the output region covered by the tile's canvas pixels
+    xy = np.array([[x1a, y1a, 1], [x2a, y1a, 1], [x1a, y2a, 1], [x2a, y2a, 1]]) - [0.5, 0.5, 0]
+    xy = xy @ M.T
+    xy = xy[:, :2] / xy[:, 2:3]
+    h, w = dst.shape[:2]
+    bx1, by1 = np.clip(np.floor(xy.min(0)).astype(int) - 3, 0, (w, h))  # + tile_owners() outlines
+    bx2, by2 = np.clip(np.ceil(xy.max(0)).astype(int) + 3, 0, (w, h))
+    if bx2 <= bx1 or by2 <= by1:  # tile outside the output
+        return
+    A = np.array([[1, 0, -bx1], [0, 1, -by1], [0, 0, 1]]) @ A
+    size = (bx2 - bx1, by2 - by1)
+    if perspective:
+        warped = cv2.warpPerspective(im[y1:y2, x1:x2], A, size, borderMode=cv2.BORDER_REPLICATE)
+    else:
+        warped = cv2.warpAffine(im[y1:y2, x1:x2], A[:2], size, borderMode=cv2.BORDER_REPLICATE)
+    cv2.copyTo(warped, mask[by1:by2, bx1:bx2].view(np.uint8), dst[by1:by2, bx1:bx2])  # in place, faster than numpy
 
 
 def copy_paste(im, labels, segments, p=0.5):
@@ -316,6 +394,56 @@ def box_candidates(box1, box2, wh_thr=2, ar_thr=100, area_thr=0.1, eps=1e-16):
     return (w2 > wh_thr) & (h2 > wh_thr) & (w2 * h2 / (w1 * h1 + eps) > area_thr) & (ar < ar_thr)  # candidates
 
 
+class BatchAugment:
+    """
+    Applies HSV color-space and flip augmentation to a whole collated batch in torch, with random parameters per
+    image, instead of per sample in the dataloader workers (see LoadImagesAndLabels `batch_augment`).
+
+    Hue, saturation and value gains are applied together as one 3x3 color matrix per image in YIQ space (a hue
+    rotation of the IQ chroma plane, a chroma scale and a luma scale), so the whole batch costs a single batched matrix
+    multiply. This approximates augment_hsv(): hue is rotated by (gain - 1) / 2 turns, its mean shift of h * gain.
+    """
+
+    RGB2YIQ = torch.tensor([[0.299, 0.587, 0.114], [0.596, -0.274, -0.322], [0.211, -0.523, 0.312]])
+
+    def __init__(self, hyp):
+        """Initializes gains and flip probabilities from the hsv_h/s/v, flipud and fliplr hyperparameters."""
+        self.gains = torch.tensor([hyp["hsv_h"], hyp["hsv_s"], hyp["hsv_v"]])
+        self.flipud = hyp["flipud"]
+        self.fliplr = hyp["fliplr"]
+
+    def __call__(self, imgs, targets):
+        """Returns the (n, 3, h, w) RGB uint8 batch `imgs` augmented as float 0-1, and its (m, 6) image, class, xywhn
+        `targets` updated for the flips. `imgs` and `targets` are modified in place.
+        """
+        n, c, h, w = imgs.shape
+        i = targets[:, 0].long()  # image index of each target
+        for p, dim, col in (self.flipud, 2, 3), (self.fliplr, 3, 2):  # up-down flips y, left-right flips x
+            if p:
+                flip = torch.rand(n) < p
+                j = flip.nonzero().view(-1).to(imgs.device)
+                imgs[j] = imgs[j].flip(dim)
+                t = flip[i]
+                targets[t, col] = 1 - targets[t, col]
+
+        if not self.gains.any():
+            return imgs.float() / 255, targets
+        m = self.color_matrices(n).to(imgs.device) / 255  # uint8 to float 0-1 folded in
+        imgs = torch.bmm(m, imgs.view(n, c, h * w).float()).view(n, c, h, w)
+        return imgs.clamp_(0, 1), targets
+
+    def color_matrices(self, n):
+        """Returns (n, 3, 3) RGB color matrices with random hue, saturation and value gains."""
+        r = (torch.rand(n, 3) * 2 - 1) * self.gains + 1  # random gains per image
+        a = (r[:, 0] - 1) * math.pi  # hue rotation (radians)
+        cos, sin = a.cos() * r[:, 1], a.sin() * r[:, 1]  # rotate and scale chroma
+        hs = torch.zeros(n, 3, 3)
+        hs[:, 0, 0] = 1
+        hs[:, 1, 1], hs[:, 1, 2], hs[:, 2, 1], hs[:, 2, 2] = cos, -sin, sin, cos
+        t = self.RGB2YIQ
+        return torch.linalg.inv(t) @ hs @ t * r[:, 2].view(n, 1, 1)
+
+
 def classify_albumentations(
     augment=True,
     size=224,
@@ -1,7 +1,9 @@
 # Ultralytics 🚀 AGPL-3.0 License - https://ultralytics.com/license
 """Dataloaders and dataset utils."""
 
+import atexit
 import contextlib
+import copy
 import glob
 import hashlib
 import json
@@ -9,8 +11,11 @@ import math
 import os
 import random
 import shutil
+import sys
 import time
+from collections import OrderedDict
 from itertools import repeat
+from multiprocessing import resource_tracker, shared_memory, sharedctypes
 from multiprocessing.pool import Pool, ThreadPool
 from pathlib import Path
 from threading import Thread
@@ -23,7 +28,7 @@ import torch.nn.functional as F
 import torchvision
 import yaml
 from PIL import ExifTags, Image, ImageOps
-from torch.utils.data import DataLoader, Dataset, dataloader, distributed
+from torch.utils.data import DataLoader, Dataset, dataloader, distributed, get_worker_info
 from tqdm import tqdm
 
 from utils.augmentations import (
@@ -35,6 +40,10 @@ from utils.augmentations import (
     letterbox,
     mixup,
     random_perspective,
+    random_perspective_matrix,
+    tile_owners,
+    warp_targets,
+    warp_tile,
 )
 from utils.general import (
     DATASETS_DIR,
@@ -48,6 +57,8 @@ from utils.general import (
     cv2,
     is_colab,
     is_kaggle,
+    labels_to_class_weights,
+    labels_to_image_weights,
     segments2boxes,
     unzip_file,
     xyn2xy,
@@ -65,6 +76,17 @@ LOCAL_RANK = int(os.getenv("LOCAL_RANK", -1))  # https://pytorch.org/docs/stable
 RANK = int(os.getenv("RANK", -1))
 WORLD_SIZE = int(os.getenv("WORLD_SIZE", 1))
 PIN_MEMORY = str(os.getenv("PIN_MEMORY", True)).lower() == "true"  # global pin_memory for dataloaders
+DISK_CACHE_CODECS = {  # --cache disk codec: (suffix, cv2.imencode params), raw is an uncompressed *.npy
+    "raw": (".npy", None),
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),  # lossless, fast
+    "jpg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 95]),
+}
+DECODE_FLAGS = {  # JPEG DCT scale-down factor: cv2.imread flag
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
 
 # Get orientation exif tag
 for orientation in ExifTags.TAGS.keys():
@@ -72,12 +94,39 @@ for orientation in ExifTags.TAGS.keys():
         break
 
 
-def get_hash(paths):
-    """Generates a single SHA256 hash for a list of file or directory paths by combining their sizes and paths."""
-    size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))  # sizes
-    h = hashlib.sha256(str(size).encode())  # hash sizes
-    h.update("".join(paths).encode())  # hash paths
-    return h.hexdigest()  # return hash
+def walk_files(root):
+    """Recursively lists file paths under `root` with os.scandir, skipping hidden entries as glob('**/*.*') does."""
+    files, dirs = [], [str(root)]
+    while dirs:
+        with os.scandir(dirs.pop()) as it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                if e.is_dir():
+                    dirs.append(e.path)
+                elif "." in e.name:
+                    files.append(e.path)
+    return files
+
+
+def file_stats(paths):
+    """Returns {path: (size, mtime_ns)} for the existing files in `paths`, listing each parent directory once with
+    os.scandir instead of calling os.stat per path.
+    """
+    stats, dirs = {}, {}
+    for p in paths:
+        d, name = os.path.split(p)
+        dirs.setdefault(d, {})[name] = p
+    for d, names in dirs.items():
+        try:
+            with os.scandir(d or ".") as it:
+                for e in it:
+                    if e.name in names and e.is_file():
+                        st = e.stat()
+                        stats[names[e.name]] = (st.st_size, st.st_mtime_ns)
+        except OSError:  # directory missing, i.e. no labels
+            pass
+    return stats
 
 
 def exif_size(img):
@@ -175,13 +224,18 @@ def create_dataloader(
     prefix="",
     shuffle=False,
     seed=0,
+    cache_budget=None,
+    cache_policy="pin",
+    cache_codec="raw",
+    batch_augment=False,
+    decode_cache=0.0,
 ):
     """Creates and returns a configured DataLoader instance for loading and processing image datasets."""
     if rect and shuffle:
         LOGGER.warning("WARNING ⚠️ --rect is incompatible with DataLoader shuffle, setting shuffle=False")
         shuffle = False
     with torch_distributed_zero_first(rank):  # init dataset *.cache only once if DDP
-        dataset = LoadImagesAndLabels(
+        dataset = (LoadImagesAndLabelsShard if is_shard(path) else LoadImagesAndLabels)(
             path,
             imgsz,
             batch_size,
@@ -195,6 +249,11 @@ def create_dataloader(
             image_weights=image_weights,
             prefix=prefix,
             rank=rank,
+            cache_budget=cache_budget,
+            cache_policy=cache_policy,
+            cache_codec=cache_codec,
+            batch_augment=batch_augment,
+            decode_cache=decode_cache,
         )
 
     batch_size = min(batch_size, len(dataset))
@@ -534,11 +593,217 @@ def img2label_paths(img_paths):
     return [sb.join(x.rsplit(sa, 1)).rsplit(".", 1)[0] + ".txt" for x in img_paths]
 
 
+def cache_columns(path, tag):
+    """Returns the *.npy column files of cache generation `tag` stored next to a labels *.cache file, i.e.
+    'train.cache.18c2f.labels.npy'. A new generation is written on every update so mapped columns are never overwritten.
+    """
+    columns = ("labels", "label_index", "shapes", "points", "point_index", "stats")
+    return {k: path.with_name(f"{path.name}.{tag}.{k}.npy") for k in columns}
+
+
+class LabelColumns:
+    """
+    Per-image view of labels stored as columns: all labels as one (m, 5) array and (n + 1,) per-image row offsets.
+
+    Indexing returns the rows of one image as a view, so no per-image arrays are kept and the columns can stay memory
+    mapped. `take()` filters/reorders images by permuting a small index, and `single_cls` zeroes classes on access
+    instead of writing to the (read-only) data.
+    """
+
+    def __init__(self, data, offsets, order=None, single_cls=False):
+        """Wraps `data` rows split per image by `offsets`, in `order` (defaults to all images in storage order)."""
+        self.data = data
+        self.offsets = offsets
+        self.order = np.arange(len(offsets) - 1) if order is None else order
+        self.single_cls = single_cls
+
+    def __len__(self):
+        """Returns the number of images."""
+        return len(self.order)
+
+    def __getitem__(self, i):
+        """Returns the (k, 5) labels of image `i` as an array view."""
+        j = self.order[i]
+        x = np.asarray(self.data[self.offsets[j] : self.offsets[j + 1]])
+        if self.single_cls:  # single-class training, merge all classes into 0
+            x = x.copy()
+            x[:, 0] = 0
+        return x
+
+    def __iter__(self):
+        """Iterates over per-image labels."""
+        return (self[i] for i in range(len(self)))
+
+    def take(self, indices):
+        """Returns a view of the images at `indices`, sharing the underlying columns."""
+        x = copy.copy(self)
+        x.order = self.order[indices]
+        return x
+
+
+class SegmentColumns(LabelColumns):
+    """Per-image segment lists stored as columns: all polygon points as one (p, 2) array, with (m + 1,) point offsets
+    per label row and (n + 1,) label row offsets per image.
+    """
+
+    def __init__(self, points, point_offsets, label_offsets, order=None):
+        """Wraps polygon `points` split per label row by `point_offsets` and per image by `label_offsets`."""
+        super().__init__(points, label_offsets, order)
+        self.point_offsets = point_offsets
+
+    def __getitem__(self, i):
+        """Returns the list of (k, 2) polygons of image `i`, empty if its labels are boxes."""
+        j = self.order[i]
+        p = self.point_offsets[self.offsets[j] : self.offsets[j + 1] + 1]
+        if len(p) < 2 or p[0] == p[-1]:  # no labels or no segments
+            return []
+        return [np.asarray(self.data[a:b]) for a, b in zip(p[:-1], p[1:])]
+
+
+class SharedImageCache:
+    """
+    RAM image cache in one shared-memory arena per node, used by `--cache ram`.
+
+    Image `i` lives at a fixed offset computed from its expected resized (h, w, 3) shape, so every DDP rank and
+    dataloader worker maps the same arena by name and reads images as zero-copy views instead of holding its own copy.
+    The arena starts with one status byte per image, set once the image is written. Pages are only committed when
+    written, so each rank can fill just its own indices. Arena names start with `yolov5_<pid>_`, the pid of the process
+    that launched the run, so arenas left behind by killed runs can be found and removed.
+    """
+
+    SHM_DIR = Path("/dev/shm")  # where POSIX shared memory lives on Linux
+
+    def __init__(self, name, shapes):
+        """Creates or attaches to arena `name` laid out for images of (n, 3) hwc `shapes`."""
+        self.name = name
+        self.shapes = shapes
+        self.offsets = len(shapes) + np.concatenate(([0], np.cumsum(shapes.prod(1)))).astype(np.int64)
+        self.owner = False  # created the arena, unlinks it at exit
+        self.open()
+
+    def open(self):
+        """Maps the arena, creating it if no other process on this node has yet."""
+        size = int(self.offsets[-1])
+        try:
+            self.shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+            self.owner = True
+            atexit.register(self.unlink)
+        except FileExistsError:  # attach without registering, so exiting workers/ranks don't unlink the owner's arena
+            if sys.version_info >= (3, 13):
+                self.shm = shared_memory.SharedMemory(self.name, track=False)
+            else:
+                register, resource_tracker.register = resource_tracker.register, lambda *args: None
+                try:
+                    self.shm = shared_memory.SharedMemory(self.name)
+                finally:
+                    resource_tracker.register = register
+        self.buf = np.ndarray((size,), dtype=np.uint8, buffer=self.shm.buf)
+
+    def unlink(self):
+        """Removes the arena name, existing mappings stay valid until their processes exit."""
+        with contextlib.suppress(Exception):
+            self.shm.unlink()
+
+    @classmethod
+    def free_bytes(cls):
+        """Returns the free bytes of the shared memory filesystem, None if it can't be queried (not Linux)."""
+        with contextlib.suppress(OSError):
+            return shutil.disk_usage(cls.SHM_DIR).free if cls.SHM_DIR.is_dir() else None
+
+    @classmethod
+    def remove_stale(cls):
+        """Unlinks arenas whose launching process no longer exists, i.e. left behind by runs that were killed."""
+        if not cls.SHM_DIR.is_dir():
+            return
+        for f in cls.SHM_DIR.glob("yolov5_*_*"):
+            pid = f.name.split("_")[1]
+            if pid.isdigit() and not psutil.pid_exists(int(pid)):
+                with contextlib.suppress(OSError):
+                    f.unlink()
+                    LOGGER.info(f"Removed stale shared memory image cache {f}")
+
+    def __len__(self):
+        """Returns the number of image slots."""
+        return len(self.shapes)
+
+    def __getitem__(self, i):
+        """Returns image `i` as a read-only view into the arena, or None if it is not cached."""
+        if not self.buf[i]:
+            return None
+        im = self.buf[self.offsets[i] : self.offsets[i + 1]].reshape(self.shapes[i])
+        im.flags.writeable = False
+        return im
+
+    def __setitem__(self, i, im):
+        """Copies image `i` into its slot, images not matching the expected shape stay uncached."""
+        if im.dtype == np.uint8 and im.shape == tuple(self.shapes[i]):
+            self.buf[self.offsets[i] : self.offsets[i + 1]] = im.reshape(-1)
+            self.buf[i] = 1
+
+    def __getstate__(self):
+        """Pickles only the layout, spawned workers map the arena by name."""
+        state = self.__dict__.copy()
+        del state["shm"], state["buf"]
+        state["owner"] = False
+        return state
+
+    def __setstate__(self, state):
+        """Maps the arena in the unpickling process."""
+        self.__dict__.update(state)
+        self.open()
+
+
+class LRUImageCache:
+    """
+    Per-process RAM image cache bounded to `budget` bytes with least-recently-used eviction, used by `--cache ram
+    --cache-policy lru` when the dataset does not fit. Each dataloader worker gets an equal share of the budget.
+    """
+
+    def __init__(self, budget):
+        """Creates an empty cache holding at most `budget` bytes of images."""
+        self.budget = budget
+        self.nbytes = 0
+        self.ims = OrderedDict()
+        self.split = False  # budget divided among dataloader workers
+
+    def __len__(self):
+        """Returns the number of cached images."""
+        return len(self.ims)
+
+    def __getitem__(self, i):
+        """Returns cached image `i` and marks it most recently used, or None."""
+        im = self.ims.get(i)
+        if im is not None:
+            self.ims.move_to_end(i)
+        return im
+
+    def __setitem__(self, i, im):
+        """Caches image `i`, evicting least recently used images to stay within the budget."""
+        if not self.split:
+            info = get_worker_info()
+            self.budget //= info.num_workers if info else 1
+            self.split = True
+        if im.nbytes > self.budget:
+            return
+        if i in self.ims:
+            self.nbytes -= self.ims.pop(i).nbytes
+        self.ims[i] = im
+        self.nbytes += im.nbytes
+        while self.nbytes > self.budget:
+            self.nbytes -= self.ims.popitem(last=False)[1].nbytes
+
+
+def take_items(x, indices):
+    """Selects `indices` from a per-image list or a LabelColumns/SegmentColumns view."""
+    return x.take(indices) if isinstance(x, LabelColumns) else [x[i] for i in indices]
+
+
 class LoadImagesAndLabels(Dataset):
     """Loads images and their corresponding labels for training and validation in YOLOv5."""
 
-    cache_version = 0.6  # dataset labels *.cache version
+    cache_version = 0.8  # dataset labels *.cache version
     rand_interp_methods = [cv2.INTER_NEAREST, cv2.INTER_LINEAR, cv2.INTER_CUBIC, cv2.INTER_AREA, cv2.INTER_LANCZOS4]
+    reduced_decode = True  # decode large JPEGs at 1/2, 1/4 or 1/8 scale in load_image(), see decode_scale()
 
     def __init__(
         self,
@@ -557,26 +822,23 @@ class LoadImagesAndLabels(Dataset):
         prefix="",
         rank=-1,
         seed=0,
+        cache_budget=None,
+        cache_policy="pin",
+        cache_codec="raw",
+        batch_augment=False,
+        decode_cache=0.0,
     ):
         """Initializes the YOLOv5 dataset loader, handling images and their labels, caching, and preprocessing."""
-        self.img_size = img_size
-        self.augment = augment
-        self.hyp = hyp
-        self.image_weights = image_weights
-        self.rect = False if image_weights else rect
-        self.mosaic = self.augment and not self.rect  # load 4 images at a time into a mosaic (only during training)
-        self.mosaic_border = [-img_size // 2, -img_size // 2]
-        self.stride = stride
-        self.path = path
-        self.albumentations = Albumentations(size=img_size) if augment else None
+        self.init_settings(path, img_size, augment, hyp, rect, image_weights, stride, cache_budget, cache_policy,
+                           cache_codec, batch_augment, decode_cache)
 
         try:
             f = []  # image files
             for p in path if isinstance(path, list) else [path]:
                 p = Path(p)  # os-agnostic
                 if p.is_dir():  # dir
-                    f += glob.glob(str(p / "**" / "*.*"), recursive=True)
-                    # f = list(p.rglob('*.*'))  # pathlib
+                    f += walk_files(p)
+                    # f = glob.glob(str(p / "**" / "*.*"), recursive=True)  # glob
                 elif p.is_file():  # file
                     with open(p) as t:
                         t = t.read().strip().splitlines()
@@ -595,11 +857,11 @@ class LoadImagesAndLabels(Dataset):
         self.label_files = img2label_paths(self.im_files)  # labels
         cache_path = (p if p.is_file() else Path(self.label_files[0]).parent).with_suffix(".cache")
         try:
-            cache, exists = np.load(cache_path, allow_pickle=True).item(), True  # load dict
-            assert cache["version"] == self.cache_version  # matches current version
-            assert cache["hash"] == get_hash(self.label_files + self.im_files)  # identical hash
+            cache = self.load_cache(cache_path)  # load dict
         except Exception:
-            cache, exists = self.cache_labels(cache_path, prefix), False  # run cache ops
+            cache = None  # missing, unreadable or older version
+        cache = self.cache_labels(cache_path, prefix, previous=cache)  # re-verify new/changed files only
+        exists = not cache["changed"]
 
         # Display cache
         nf, nm, ne, nc, n = cache.pop("results")  # found, missing, empty, corrupt, total
@@ -607,18 +869,43 @@ class LoadImagesAndLabels(Dataset):
             d = f"Scanning {cache_path}... {nf} images, {nm + ne} backgrounds, {nc} corrupt"
             tqdm(None, desc=prefix + d, total=n, initial=n, bar_format=TQDM_BAR_FORMAT)  # display cache results
             if cache["msgs"]:
-                LOGGER.info("\n".join(cache["msgs"]))  # display warnings
+                LOGGER.info("\n".join(cache["msgs"].values()))  # display warnings
         assert nf > 0 or not augment, f"{prefix}No labels found in {cache_path}, can not start training. {HELP_URL}"
 
         # Read cache
-        [cache.pop(k) for k in ("hash", "version", "msgs")]  # remove items
-        labels, shapes, self.segments = zip(*cache.values())
-        nl = len(np.concatenate(labels, 0))  # number of labels
+        self.labels, self.segments = cache["labels"], cache["segments"]  # columnar, indexed per image on access
+        nl = len(self.labels.data)  # number of labels
         assert nl > 0 or not augment, f"{prefix}All labels empty in {cache_path}, can not start training. {HELP_URL}"
-        self.labels = list(labels)
-        self.shapes = np.array(shapes)
-        self.im_files = list(cache.keys())  # update
-        self.label_files = img2label_paths(cache.keys())  # update
+        self.shapes = np.array(cache["shapes"])
+        self.im_files = cache["im_files"]  # update
+        self.label_files = img2label_paths(self.im_files)  # update
+        self.cache_dir = cache_path.with_suffix(".images")  # --cache disk images, resized to img_size
+        self.init_samples(batch_size, single_cls, stride, pad, min_items, cache_images, prefix, rank, seed)
+
+    def init_settings(self, path, img_size, augment, hyp, rect, image_weights, stride, cache_budget, cache_policy,
+                      cache_codec, batch_augment, decode_cache):
+        """Stores the dataset options and sets up mosaic and albumentations, before any image or label is read."""
+        self.cache_budget = cache_budget  # GB, RAM cache limit (None for all available memory)
+        self.cache_policy = cache_policy  # 'pin' or 'lru', RAM cache policy when the dataset does not fit
+        self.cache_codec = cache_codec  # --cache disk image codec, see DISK_CACHE_CODECS
+        self.batch_augment = batch_augment  # leave HSV and flips to utils.augmentations.BatchAugment after collate
+        self.decode_cache = decode_cache  # GB, LRU of recently decoded images when not caching in RAM (0 for none)
+        self.img_size = img_size
+        self.augment = augment
+        self.hyp = hyp
+        self.image_weights = image_weights
+        self.rect = False if image_weights else rect
+        self.mosaic = self.augment and not self.rect  # load 4 images at a time into a mosaic (only during training)
+        self.mosaic_border = [-img_size // 2, -img_size // 2]
+        self.stride = stride
+        self.path = path
+        self.albumentations = Albumentations(size=img_size) if augment else None
+
+    def init_samples(self, batch_size, single_cls, stride, pad, min_items, cache_images, prefix, rank, seed):
+        """Filters samples, builds batch/DDP indices and rect shapes, and optionally caches images, once `im_files`,
+        `label_files`, `labels`, `shapes` and `segments` are set.
+        """
+        img_size, n = self.img_size, len(self.labels)
 
         # Filter images
         if min_items:
@@ -626,8 +913,8 @@ class LoadImagesAndLabels(Dataset):
             LOGGER.info(f"{prefix}{n - len(include)}/{n} images filtered from dataset")
             self.im_files = [self.im_files[i] for i in include]
             self.label_files = [self.label_files[i] for i in include]
-            self.labels = [self.labels[i] for i in include]
-            self.segments = [self.segments[i] for i in include]
+            self.labels = take_items(self.labels, include)
+            self.segments = take_items(self.segments, include)
             self.shapes = self.shapes[include]  # wh
 
         # Create indices
@@ -643,16 +930,19 @@ class LoadImagesAndLabels(Dataset):
 
         # Update labels
         include_class = []  # filter labels to include only these classes (optional)
-        self.segments = list(self.segments)
-        include_class_array = np.array(include_class).reshape(1, -1)
-        for i, (label, segment) in enumerate(zip(self.labels, self.segments)):
-            if include_class:
-                j = (label[:, 0:1] == include_class_array).any(1)
-                self.labels[i] = label[j]
-                if segment:
-                    self.segments[i] = [segment[idx] for idx, elem in enumerate(j) if elem]
-            if single_cls:  # single-class training, merge all classes into 0
-                self.labels[i][:, 0] = 0
+        if isinstance(self.labels, LabelColumns):  # columnar labels are read-only, merge classes on access
+            self.labels.single_cls = single_cls
+        else:
+            self.segments = list(self.segments)
+            include_class_array = np.array(include_class).reshape(1, -1)
+            for i, (label, segment) in enumerate(zip(self.labels, self.segments)):
+                if include_class:
+                    j = (label[:, 0:1] == include_class_array).any(1)
+                    self.labels[i] = label[j]
+                    if segment:
+                        self.segments[i] = [segment[idx] for idx, elem in enumerate(j) if elem]
+                if single_cls:  # single-class training, merge all classes into 0
+                    self.labels[i][:, 0] = 0
 
         # Rectangular Training
         if self.rect:
@@ -662,8 +952,8 @@ class LoadImagesAndLabels(Dataset):
             irect = ar.argsort()
             self.im_files = [self.im_files[i] for i in irect]
             self.label_files = [self.label_files[i] for i in irect]
-            self.labels = [self.labels[i] for i in irect]
-            self.segments = [self.segments[i] for i in irect]
+            self.labels = take_items(self.labels, irect)
+            self.segments = take_items(self.segments, irect)
             self.shapes = s[irect]  # wh
             ar = ar[irect]
 
@@ -680,32 +970,171 @@ class LoadImagesAndLabels(Dataset):
             self.batch_shapes = np.ceil(np.array(shapes) * img_size / stride + pad).astype(int) * stride
 
         # Cache images into RAM/disk for faster training
-        if cache_images == "ram" and not self.check_cache_ram(prefix=prefix):
-            cache_images = False
         self.ims = [None] * n
         self.npy_files = [Path(f).with_suffix(".npy") for f in self.im_files]
+        self.cache_files = self.disk_cache_files() if cache_images == "disk" else None
+        if self.cache_files and LOCAL_RANK in {-1, 0}:
+            self.prune_disk_cache(prefix)
+        self.cache_counts = None  # RAM cache (hits, misses) per process slot, see cache_report()
+        budget = None  # RAM cache bytes when the dataset does not fit or --cache-budget is set
+        if self.image_weights:  # needs a non-persistent DataLoader, its workers and their LRU caches restart each epoch
+            if cache_images == "ram" and self.cache_policy == "lru":
+                LOGGER.warning(f"{prefix}WARNING ⚠️ --image-weights would empty --cache-policy lru caches, using pin")
+                self.cache_policy = "pin"
+            if self.decode_cache and cache_images != "ram":
+                LOGGER.warning(f"{prefix}WARNING ⚠️ --image-weights would empty --decode-cache caches, disabling it")
+                self.decode_cache = 0.0
+        if cache_images == "ram" and (self.cache_budget is not None or not self.check_cache_ram(prefix=prefix)):
+            budget = self.ram_budget(prefix=prefix)
         if cache_images:
             b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
             self.im_hw0, self.im_hw = [None] * n, [None] * n
+            indices = self.indices
+            if cache_images == "ram":
+                self.cache_counts = sharedctypes.RawArray("q", 2 * 64)  # main process + up to 63 workers
+                if budget is not None and self.cache_policy == "lru":  # filled on access by each process
+                    self.ims, indices = LRUImageCache(budget // WORLD_SIZE), []
+                else:  # one shared arena per node for all ranks and workers, partially filled if over budget
+                    try:
+                        self.ims = self.shared_cache()
+                        budget = self.shm_budget(budget, prefix)
+                    except OSError as e:  # no usable shared memory, keep per-process caches
+                        LOGGER.warning(f"{prefix}WARNING ⚠️ No shared memory image cache ({e}), caching per process")
+                    if budget is not None:
+                        indices = self.pinned_indices(budget // WORLD_SIZE)
             fcn = self.cache_images_to_disk if cache_images == "disk" else self.load_image
             with ThreadPool(NUM_THREADS) as pool:
-                results = pool.imap(lambda i: (i, fcn(i)), self.indices)
-                pbar = tqdm(results, total=len(self.indices), bar_format=TQDM_BAR_FORMAT, disable=LOCAL_RANK > 0)
+                results = pool.imap(lambda i: (i, fcn(i)), indices)
+                pbar = tqdm(results, total=len(indices), bar_format=TQDM_BAR_FORMAT, disable=LOCAL_RANK > 0)
                 for i, x in pbar:
                     if cache_images == "disk":
-                        b += self.npy_files[i].stat().st_size
+                        b += self.cache_files[i].stat().st_size
                     else:  # 'ram'
                         self.ims[i], self.im_hw0[i], self.im_hw[i] = x  # im, hw_orig, hw_resized = load_image(self, i)
-                        b += self.ims[i].nbytes * WORLD_SIZE
+                        b += x[0].nbytes * WORLD_SIZE
                     pbar.desc = f"{prefix}Caching images ({b / gb:.1f}GB {cache_images})"
                 pbar.close()
+            self.cache_report()  # reset counters after filling
+        if self.decode_cache and cache_images != "ram":  # mosaic and mixup reload images, keep recent ones decoded
+            self.im_hw0, self.im_hw = [None] * n, [None] * n
+            self.cache_counts = sharedctypes.RawArray("q", 2 * 64)
+            self.ims = LRUImageCache(int(self.decode_cache * (1 << 30)) // WORLD_SIZE)
+            LOGGER.info(f"{prefix}Keeping up to {self.decode_cache:g}GB of decoded images in LRU caches")
+
+    def image_keys(self):
+        """Returns a string per image that changes whenever the image file does, used to key the disk cache."""
+        stats = file_stats(self.im_files)
+        return [f"{f}:{stats.get(f, (-1, -1))[0]}:{stats.get(f, (-1, -1))[1]}" for f in self.im_files]
+
+    def disk_cache_files(self):
+        """Returns the --cache disk file of each image, named by a hash of the image key so edited images get new
+        entries, in a subdirectory of `cache_dir` per img_size, resize interpolation and codec, e.g. 640_train_raw.
+        """
+        d = self.cache_dir / f"{self.img_size}_{'train' if self.augment else 'val'}_{self.cache_codec}"
+        d.mkdir(parents=True, exist_ok=True)
+        suffix = DISK_CACHE_CODECS[self.cache_codec][0]
+        return [d / f"{hashlib.sha1(k.encode()).hexdigest()[:20]}{suffix}" for k in self.image_keys()]
+
+    def prune_disk_cache(self, prefix="", tmp_age=3600):
+        """Deletes entries of edited or deleted images from this dataset's --cache disk subdirectory, and files left in
+        `cache_dir` itself by older versions. Other subdirectories belong to datasets with another img_size, augment or
+        codec (e.g. the val loader sharing a labels directory) and are kept. Temporary files are kept for `tmp_age`
+        seconds, another process may still be writing them.
+        """
+        keep, n, b = set(self.cache_files), 0, 0
+        now = time.time()
+        for d in self.cache_files[0].parent, self.cache_dir:
+            with os.scandir(d) as it:
+                for e in it:
+                    if Path(e.path) in keep or not e.is_file():
+                        continue
+                    with contextlib.suppress(OSError):
+                        st = e.stat()
+                        if e.name.endswith(".tmp") and now - st.st_mtime < tmp_age:
+                            continue
+                        os.remove(e.path)
+                        n, b = n + 1, b + st.st_size
+        if n:
+            LOGGER.info(f"{prefix}Removed {n} stale disk cache images ({b / (1 << 30):.2f}GB) from {self.cache_dir}")
+
+    def resized_shapes(self):
+        """Returns the (n, 3) hwc shapes of all images once resized by load_image()."""
+        w0, h0 = self.shapes[:, 0].astype(np.float64), self.shapes[:, 1].astype(np.float64)
+        r = self.img_size / np.maximum(h0, w0)
+        return np.stack((np.ceil(h0 * r), np.ceil(w0 * r), np.full_like(r, 3)), 1).astype(np.int64)
+
+    def shared_cache(self):
+        """Returns the node's SharedImageCache for this dataset, sized from the resized image shapes. The arena name is
+        derived from the files, size and launching process (torch.distributed.run's agent for DDP, else this process)
+        and its start time, so all local ranks of one run share it and every launch gets a new one.
+        """
+        pid = os.getppid() if "TORCHELASTIC_RUN_ID" in os.environ else os.getpid()
+        launch = str(pid)
+        with contextlib.suppress(psutil.Error):
+            launch += f":{psutil.Process(pid).create_time()}"  # pids are reused, start times are not
+        h = hashlib.sha1("\n".join([*self.im_files, str(self.img_size), str(self.augment), launch]).encode())
+        if LOCAL_RANK in {-1, 0}:
+            SharedImageCache.remove_stale()
+        return SharedImageCache(f"yolov5_{pid}_{h.hexdigest()[:16]}", self.resized_shapes())
+
+    def pinned_indices(self, budget):
+        """Returns the indices to keep in a RAM cache of `budget` bytes: the most frequently sampled images under
+        --image-weights (by initial class-balanced image weights), otherwise the first images that fit.
+        """
+        order = self.indices
+        if self.image_weights and len(self.labels.data if isinstance(self.labels, LabelColumns) else self.labels):
+            nc = int(max(x[:, 0].max() for x in self.labels if len(x))) + 1
+            iw = labels_to_image_weights(self.labels, nc, labels_to_class_weights(self.labels, nc).numpy())
+            order = order[np.argsort(-iw[order], kind="stable")]
+        return order[np.cumsum(self.resized_shapes()[order].prod(1)) <= budget]
+
+    def ram_budget(self, safety_margin=0.1, prefix=""):
+        """Returns the RAM cache size in bytes: available memory less a safety margin, capped at --cache-budget."""
+        gb = 1 << 30
+        b = psutil.virtual_memory().available * (1 - safety_margin)
+        if self.cache_budget is not None:
+            b = min(b, self.cache_budget * gb)
+        LOGGER.info(f"{prefix}Caching images up to {b / gb:.1f}GB RAM ({self.cache_policy})")
+        return int(b)
+
+    def shm_budget(self, budget, prefix="", safety_margin=0.1):
+        """Returns RAM cache `budget` capped to the free shared memory, as writing past it crashes with SIGBUS."""
+        free = SharedImageCache.free_bytes()
+        if free is None:
+            return budget
+        free, gb = int(free * (1 - safety_margin)), 1 << 30
+        need = int(self.resized_shapes().prod(1).sum())
+        if free < min(need, budget if budget is not None else need):
+            LOGGER.warning(
+                f"{prefix}WARNING ⚠️ {SharedImageCache.SHM_DIR} has {free / gb:.1f}GB free for {need / gb:.1f}GB of "
+                "images, caching part of them. Increase its size (e.g. docker --shm-size) to cache all"
+            )
+            return free
+        return budget
+
+    def count_cache(self, hit):
+        """Counts a RAM cache hit or miss in the slot of the current process (main process or dataloader worker)."""
+        info = get_worker_info()
+        k = 0 if info is None else (info.id + 1) % 64
+        self.cache_counts[2 * k + (not hit)] += 1
+
+    def cache_report(self):
+        """Returns image cache hits/misses since the last call as a log string, '' if images are not cached in RAM."""
+        if self.cache_counts is None:
+            return ""
+        c = np.frombuffer(self.cache_counts, dtype=np.int64)
+        hits, misses = int(c[0::2].sum()), int(c[1::2].sum())
+        c[:] = 0
+        n = hits + misses
+        policy = "lru" if isinstance(self.ims, LRUImageCache) else self.cache_policy
+        return f"Image cache ({policy}): {hits / max(n, 1):.1%} hit rate, {hits} hits, {misses} misses"
 
     def check_cache_ram(self, safety_margin=0.1, prefix=""):
         """Checks if available RAM is sufficient for caching images, adjusting for a safety margin."""
         b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
         n = min(self.n, 30)  # extrapolate from 30 random images
         for _ in range(n):
-            im = cv2.imread(random.choice(self.im_files))  # sample image
+            im = self.read_image(random.randrange(self.n))  # sample image
             ratio = self.img_size / max(im.shape[0], im.shape[1])  # max(h, w)  # ratio
             b += im.nbytes * ratio**2
         mem_required = b * self.n / n  # GB required to cache dataset into RAM
@@ -715,48 +1144,131 @@ class LoadImagesAndLabels(Dataset):
             LOGGER.info(
                 f"{prefix}{mem_required / gb:.1f}GB RAM required, "
                 f"{mem.available / gb:.1f}/{mem.total / gb:.1f}GB available, "
-                f"{'caching images ✅' if cache else 'not caching images ⚠️'}"
+                f"{'caching images ✅' if cache else 'caching as many images as fit ⚠️'}"
             )
         return cache
 
-    def cache_labels(self, path=Path("./labels.cache"), prefix=""):
-        """Caches dataset labels, verifies images, reads shapes, and tracks dataset integrity."""
+    def load_cache(self, path):
+        """Loads a labels *.cache: a small metadata dict plus label/shape/segment columns memory mapped from *.npy."""
+        x = np.load(path, allow_pickle=True).item()
+        assert x["version"] == self.cache_version  # older caches are pickled per-image dicts
+        c = {k: np.load(f, mmap_mode="r") for k, f in cache_columns(path, x["tag"]).items()}
+        return self.unpack_cache(x, c)
+
+    @staticmethod
+    def unpack_cache(x, c):
+        """Adds per-image views of columns `c` to cache metadata dict `x`."""
+        x["im_files"] = x.pop("files").split("\n") if x["files"] else []
+        x["labels"] = LabelColumns(c["labels"], c["label_index"])
+        x["segments"] = SegmentColumns(c["points"], c["point_index"], c["label_index"])
+        x["shapes"] = c["shapes"]
+        x["stats"] = c["stats"]
+        return x
+
+    def cache_labels(self, path=Path("./labels.cache"), prefix="", previous=None):
+        """
+        Caches dataset labels, verifies images, reads shapes, and tracks dataset integrity.
+
+        Each image keeps a (size, mtime) record of itself and its label file. Only new files and files whose record
+        differs from the `previous` cache are verified again, everything else is reused from `previous`.
+        """
+        stats = file_stats(self.im_files + self.label_files)
+        records = [stats.get(f, (-1, -1)) + stats.get(lb, (-1, -1)) for f, lb in zip(self.im_files, self.label_files)]
+        old, corrupt, msgs = {}, {}, {}  # previous row index, corrupt files, warnings (by image file)
+        if previous:
+            old = {f: (i, tuple(r)) for i, (f, r) in enumerate(zip(previous["im_files"], previous["stats"].tolist()))}
+            corrupt, msgs = previous["corrupt"], previous["msgs"]
+        reuse, todo = {}, []
+        for f, lb, r in zip(self.im_files, self.label_files, records):
+            if f in old and old[f][1] == r:
+                reuse[f] = old[f][0]
+            elif corrupt.get(f) != r:
+                todo.append((f, lb))
+        corrupt = {f: r for f, r in zip(self.im_files, records) if corrupt.get(f) == r}  # unchanged and still corrupt
+        changed = len(todo) + len(old) - len(reuse)  # new/changed + removed files
+        if previous and not changed and len(corrupt) == len(previous["corrupt"]):
+            previous["changed"] = 0
+            return previous
+
+        verified = {}
+        if todo:
+            nf, nc = 0, 0
+            desc = f"{prefix}Scanning {path.parent / path.stem}..."
+            with Pool(NUM_THREADS) as pool:
+                pbar = tqdm(
+                    pool.imap(verify_image_label, zip(*zip(*todo), repeat(prefix))),
+                    desc=desc,
+                    total=len(todo),
+                    bar_format=TQDM_BAR_FORMAT,
+                )
+                for (f, _), (im_file, lb, shape, segments, nm_f, nf_f, ne_f, nc_f, msg) in zip(todo, pbar):
+                    nf += nf_f
+                    nc += nc_f
+                    if im_file:
+                        verified[f] = lb, shape, segments
+                    msgs.pop(f, None)
+                    if msg:
+                        msgs[f] = msg
+                    pbar.desc = f"{desc} {nf} new/changed images, {nc} corrupt"
+            pbar.close()
+            LOGGER.info(f"{prefix}{len(todo)} new/changed, {len(reuse)} unchanged images")
+
         x = {}  # dict
-        nm, nf, ne, nc, msgs = 0, 0, 0, 0, []  # number missing, found, empty, corrupt, messages
-        desc = f"{prefix}Scanning {path.parent / path.stem}..."
-        with Pool(NUM_THREADS) as pool:
-            pbar = tqdm(
-                pool.imap(verify_image_label, zip(self.im_files, self.label_files, repeat(prefix))),
-                desc=desc,
-                total=len(self.im_files),
-                bar_format=TQDM_BAR_FORMAT,
-            )
-            for im_file, lb, shape, segments, nm_f, nf_f, ne_f, nc_f, msg in pbar:
-                nm += nm_f
-                nf += nf_f
-                ne += ne_f
-                nc += nc_f
-                if im_file:
-                    x[im_file] = [lb, shape, segments]
-                if msg:
-                    msgs.append(msg)
-                pbar.desc = f"{desc} {nf} images, {nm + ne} backgrounds, {nc} corrupt"
-
-        pbar.close()
-        if msgs:
-            LOGGER.info("\n".join(msgs))
+        files, shapes, labels, label_index, points, point_index, rows = [], [], [], [0], [], [0], []  # columns
+        for f, r in zip(self.im_files, records):
+            if f in reuse:
+                i = reuse[f]
+                lb, shape, segments = previous["labels"][i], previous["shapes"][i], previous["segments"][i]
+            elif f in verified:
+                lb, shape, segments = verified[f]
+            else:
+                corrupt[f] = r
+                continue
+            files.append(f)
+            shapes.append(shape)
+            labels.append(lb)
+            label_index.append(label_index[-1] + len(lb))
+            for segment in segments or [()] * len(lb):  # one (possibly empty) polygon per label row
+                point_index.append(point_index[-1] + len(segment))
+            points += segments
+            rows.append(r)
+
+        msgs = {f: m for f, m in msgs.items() if f in stats}  # drop warnings of removed files
+        if msgs and todo:
+            LOGGER.info("\n".join(msgs[f] for f, _ in todo if f in msgs))
+        c = {
+            "labels": np.concatenate(labels, 0) if labels else np.zeros((0, 5), dtype=np.float32),
+            "label_index": np.array(label_index, dtype=np.int64),
+            "shapes": np.array(shapes, dtype=np.int32).reshape(-1, 2),
+            "points": np.concatenate(points, 0).astype(np.float32) if points else np.zeros((0, 2), dtype=np.float32),
+            "point_index": np.array(point_index, dtype=np.int64),
+            "stats": np.array(rows, dtype=np.int64).reshape(-1, 4),  # image size, mtime, label size, mtime
+        }
+        found = c["stats"][:, 2] >= 0  # label file exists
+        nf, nm = int(found.sum()), int((~found).sum())
+        ne = int((found & (np.diff(c["label_index"]) == 0)).sum())
         if nf == 0:
             LOGGER.warning(f"{prefix}WARNING ⚠️ No labels found in {path}. {HELP_URL}")
-        x["hash"] = get_hash(self.label_files + self.im_files)
-        x["results"] = nf, nm, ne, nc, len(self.im_files)
+        x["results"] = nf, nm, ne, len(corrupt), len(self.im_files)
         x["msgs"] = msgs  # warnings
+        x["corrupt"] = corrupt  # records of corrupt images, verified again only once they change
         x["version"] = self.cache_version  # cache version
+        x["files"] = "\n".join(files)
+        x["tag"] = f"{time.time_ns():x}"  # column files generation
         try:
+            columns = cache_columns(path, x["tag"])
+            for k, f in columns.items():
+                np.save(f, c[k])  # columns first, the *.cache metadata file below marks the cache complete
             np.save(path, x)  # save cache for next time
             path.with_suffix(".cache.npy").rename(path)  # remove .npy suffix
+            for f in set(path.parent.glob(f"{glob.escape(path.name)}.*.npy")) - set(columns.values()):
+                with contextlib.suppress(OSError):  # still mapped on Windows, removed on a later update
+                    f.unlink()  # previous generation
             LOGGER.info(f"{prefix}New cache created: {path}")
         except Exception as e:
             LOGGER.warning(f"{prefix}WARNING ⚠️ Cache directory {path.parent} is not writeable: {e}")  # not writeable
+        x = self.unpack_cache(x, c)
+        x["changed"] = changed
         return x
 
     def __len__(self):
@@ -816,6 +1328,7 @@ class LoadImagesAndLabels(Dataset):
             img, labels = self.albumentations(img, labels)
             nl = len(labels)  # update after albumentations
 
+        if self.augment and not self.batch_augment:
             # HSV color-space
             augment_hsv(img, hgain=hyp["hsv_h"], sgain=hyp["hsv_s"], vgain=hyp["hsv_v"])
 
@@ -845,51 +1358,97 @@ class LoadImagesAndLabels(Dataset):
 
         return torch.from_numpy(img), labels_out, self.im_files[index], shapes
 
-    def load_image(self, i):
+    def load_image(self, i, resize=True):
         """
         Loads an image by index, returning the image, its original dimensions, and resized dimensions.
 
+        With resize=False an image that is not cached is returned as decoded, for the caller to scale to resized hw.
         Returns (im, original hw, resized hw)
         """
-        im, f, fn = (
-            self.ims[i],
-            self.im_files[i],
-            self.npy_files[i],
-        )
+        im = self.ims[i]
+        if self.cache_counts is not None:
+            self.count_cache(im is not None)
         if im is None:  # not cached in RAM
-            if fn.exists():  # load npy
-                im = np.load(fn)
-            else:  # read image
-                im = cv2.imread(f)  # BGR
-                assert im is not None, f"Image Not Found {f}"
-            h0, w0 = im.shape[:2]  # orig hw
-            r = self.img_size / max(h0, w0)  # ratio
-            if r != 1:  # if sizes are not equal
-                interp = cv2.INTER_LINEAR if (self.augment or r > 1) else cv2.INTER_AREA
-                im = cv2.resize(im, (math.ceil(w0 * r), math.ceil(h0 * r)), interpolation=interp)
+            im = self.read_disk_cache(i) if self.cache_files else None  # already resized
+            if im is not None:
+                h0, w0 = self.shapes[i][::-1].tolist()  # orig hw
+            else:
+                k = self.decode_scale(i)
+                im = self.read_image(i, k)  # BGR, at 1/k resolution
+                h0, w0 = im.shape[:2] if k == 1 else self.shapes[i][::-1].tolist()  # orig hw
+                r = self.img_size / max(h0, w0)  # ratio
+                if r != 1:  # if sizes are not equal
+                    if not resize and not isinstance(self.ims, LRUImageCache):
+                        return im, (h0, w0), (math.ceil(h0 * r), math.ceil(w0 * r))
+                    interp = cv2.INTER_LINEAR if (self.augment or r > 1) else cv2.INTER_AREA
+                    im = cv2.resize(im, (math.ceil(w0 * r), math.ceil(h0 * r)), interpolation=interp)
+            if isinstance(self.ims, LRUImageCache):
+                self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
             return im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
-        return self.ims[i], self.im_hw0[i], self.im_hw[i]  # im, hw_original, hw_resized
+        hw0 = self.im_hw0[i] or tuple(self.shapes[i][::-1].tolist())  # slot may have been filled by another rank
+        return im, hw0, im.shape[:2]  # im, hw_original, hw_resized
+
+    def decode_scale(self, i):
+        """Returns the largest JPEG DCT scale-down factor (1, 2, 4 or 8) that still decodes image `i` at no less than
+        `img_size` on its long side, from the image size in the label cache.
+        """
+        if not self.reduced_decode or Path(self.im_files[i]).suffix.lower() not in {".jpg", ".jpeg"}:
+            return 1
+        s = int(self.shapes[i].max())
+        return next((k for k in (8, 4, 2) if s // k >= self.img_size), 1)
+
+    def read_image(self, i, scale=1):
+        """Reads the BGR image at index `i` from its legacy full-resolution *.npy file if present, else decodes the
+        image at 1/`scale` resolution (see decode_scale()).
+        """
+        f, fn = self.im_files[i], self.npy_files[i]
+        if fn.exists():  # load npy
+            return np.load(fn)
+        im = cv2.imread(f, DECODE_FLAGS[scale])  # BGR
+        assert im is not None, f"Image Not Found {f}"
+        return im
+
+    def read_disk_cache(self, i):
+        """Reads the resized BGR image at index `i` from the disk cache, or None if it is missing or unreadable."""
+        f = self.cache_files[i]
+        if not f.exists():
+            return None
+        with contextlib.suppress(Exception):
+            return np.load(f) if f.suffix == ".npy" else cv2.imread(str(f), cv2.IMREAD_COLOR)
 
     def cache_images_to_disk(self, i):
-        """Saves an image to disk as an *.npy file for quicker loading, identified by index `i`."""
-        f = self.npy_files[i]
+        """Saves image `i` resized to `img_size` in the disk cache for quicker loading, using `cache_codec`."""
+        f = self.cache_files[i]
         if not f.exists():
-            np.save(f.as_posix(), cv2.imread(self.im_files[i]))
+            im = self.load_image(i)[0]
+            tmp = f.with_name(f"{f.name}.{os.getpid()}.tmp")  # write then rename, other ranks may cache concurrently
+            with open(tmp, "wb") as fh:
+                suffix, params = DISK_CACHE_CODECS[self.cache_codec]
+                if params is None:
+                    np.save(fh, im)
+                else:
+                    fh.write(cv2.imencode(suffix, im, params)[1].tobytes())
+            os.replace(tmp, f)
 
     def load_mosaic(self, index):
-        """Loads a 4-image mosaic for YOLOv5, combining 1 selected and 3 random images, with labels and segments."""
-        labels4, segments4 = [], []
+        """
+        Loads a 4-image mosaic for YOLOv5, combining 1 selected and 3 random images, with labels and segments.
+
+        Each tile is warped once with its resize, placement and the random perspective composed into one matrix,
+        straight into the final img_size output. Only copy-paste needs the full 2x mosaic canvas.
+        """
+        labels4, segments4, tiles = [], [], []
         s = self.img_size
+        canvas = self.hyp["copy_paste"] > 0  # paste tiles into the 2x canvas, then warp it with random_perspective()
         yc, xc = (int(random.uniform(-x, 2 * s + x)) for x in self.mosaic_border)  # mosaic center x, y
         indices = [index] + random.choices(self.indices, k=3)  # 3 additional image indices
         random.shuffle(indices)
         for i, index in enumerate(indices):
-            # Load image
-            img, _, (h, w) = self.load_image(index)
+            # Load image, uncached images are resized by warp_tile()
+            img, _, (h, w) = self.load_image(index, resize=canvas)
 
             # place img in img4
             if i == 0:  # top left
-                img4 = np.full((s * 2, s * 2, img.shape[2]), 114, dtype=np.uint8)  # base image with 4 tiles
                 x1a, y1a, x2a, y2a = max(xc - w, 0), max(yc - h, 0), xc, yc  # xmin, ymin, xmax, ymax (large image)
                 x1b, y1b, x2b, y2b = w - (x2a - x1a), h - (y2a - y1a), w, h  # xmin, ymin, xmax, ymax (small image)
             elif i == 1:  # top right
@@ -902,7 +1461,7 @@ class LoadImagesAndLabels(Dataset):
                 x1a, y1a, x2a, y2a = xc, yc, min(xc + w, s * 2), min(s * 2, yc + h)
                 x1b, y1b, x2b, y2b = 0, 0, min(w, x2a - x1a), min(y2a - y1a, h)
 
-            img4[y1a:y2a, x1a:x2a] = img[y1b:y2b, x1b:x2b]  # img4[ymin:ymax, xmin:xmax]
+            tiles.append((img, (x1a, y1a, x2a, y2a), (x1b, y1b, x2b, y2b), (h, w)))
             padw = x1a - x1b
             padh = y1a - y1b
 
@@ -921,18 +1480,38 @@ class LoadImagesAndLabels(Dataset):
         # img4, labels4 = replicate(img4, labels4)  # replicate
 
         # Augment
-        img4, labels4, segments4 = copy_paste(img4, labels4, segments4, p=self.hyp["copy_paste"])
-        img4, labels4 = random_perspective(
-            img4,
-            labels4,
-            segments4,
-            degrees=self.hyp["degrees"],
-            translate=self.hyp["translate"],
-            scale=self.hyp["scale"],
-            shear=self.hyp["shear"],
-            perspective=self.hyp["perspective"],
-            border=self.mosaic_border,
-        )  # border to remove
+        hyp = self.hyp
+        if canvas:
+            img4 = np.full((s * 2, s * 2, 3), 114, dtype=np.uint8)  # base image with 4 tiles
+            for img, (x1a, y1a, x2a, y2a), (x1b, y1b, x2b, y2b), _ in tiles:
+                img4[y1a:y2a, x1a:x2a] = img[y1b:y2b, x1b:x2b]  # img4[ymin:ymax, xmin:xmax]
+            img4, labels4, segments4 = copy_paste(img4, labels4, segments4, p=hyp["copy_paste"])
+            img4, labels4 = random_perspective(
+                img4,
+                labels4,
+                segments4,
+                degrees=hyp["degrees"],
+                translate=hyp["translate"],
+                scale=hyp["scale"],
+                shear=hyp["shear"],
+                perspective=hyp["perspective"],
+                border=self.mosaic_border,
+            )  # border to remove
+        else:
+            M, gain, (width, height) = random_perspective_matrix(
+                (s * 2, s * 2),
+                degrees=hyp["degrees"],
+                translate=hyp["translate"],
+                scale=hyp["scale"],
+                shear=hyp["shear"],
+                perspective=hyp["perspective"],
+                border=self.mosaic_border,
+            )
+            img4 = np.full((height, width, 3), 114, dtype=np.uint8)
+            owners = tile_owners([t[1] for t in tiles], M, (width, height))
+            for k, tile in enumerate(tiles, 1):
+                warp_tile(img4, *tile, M, owners == k, perspective=hyp["perspective"])
+            labels4 = warp_targets(labels4, segments4, M, gain, width, height, hyp["perspective"])
 
         return img4, labels4
 
@@ -1054,6 +1633,104 @@ class LoadImagesAndLabels(Dataset):
         return torch.stack(im4, 0), torch.cat(label4, 0), path4, shapes4
 
 
+def is_shard(path):
+    """Checks if `path` is a packed dataset shard directory written by `prepare_dataset.py --shards`."""
+    return not isinstance(path, (list, tuple)) and (Path(path) / "images.bin").is_file()
+
+
+class LoadImagesAndLabelsShard(LoadImagesAndLabels):
+    """
+    Loads images and labels from a packed dataset shard written by `prepare_dataset.py --shards`.
+
+    A shard directory holds all encoded images back to back in `images.bin`, their byte offsets in `index.npy`, image
+    sizes in `shapes.npy`, all labels as one (m, 5) array in `labels.npy` with per-image offsets in `label_index.npy`,
+    and the source file names in `files.txt`. Images are decoded straight from a read-only memory map of the blob, so
+    no per-image file is opened and worker processes share the page cache instead of copying data.
+    """
+
+    def __init__(
+        self,
+        path,
+        img_size=640,
+        batch_size=16,
+        augment=False,
+        hyp=None,
+        rect=False,
+        image_weights=False,
+        cache_images=False,
+        single_cls=False,
+        stride=32,
+        pad=0.0,
+        min_items=0,
+        prefix="",
+        rank=-1,
+        seed=0,
+        cache_budget=None,
+        cache_policy="pin",
+        cache_codec="raw",
+        batch_augment=False,
+        decode_cache=0.0,
+    ):
+        """Opens the shard at `path` and sets up samples exactly as LoadImagesAndLabels would for the same images."""
+        self.init_settings(path, img_size, augment, hyp, rect, image_weights, stride, cache_budget, cache_policy,
+                           cache_codec, batch_augment, decode_cache)
+
+        self.shard = Path(path)
+        self._blob = None  # images.bin memory map, opened lazily in each process
+        try:
+            names = (self.shard / "files.txt").read_text().splitlines()
+            offsets = np.load(self.shard / "index.npy")  # (n + 1,) byte offsets into images.bin
+            shapes = np.load(self.shard / "shapes.npy")  # (n, 2) wh
+            lb = np.load(self.shard / "labels.npy", mmap_mode="r")  # (m, 5) cls, xywh normalized
+            li = np.load(self.shard / "label_index.npy")  # (n + 1,) row offsets into labels.npy
+            assert len(names) == len(shapes) == len(offsets) - 1 == len(li) - 1, "inconsistent shard index"
+        except Exception as e:
+            raise Exception(f"{prefix}Error loading shard {path}: {e}\n{HELP_URL}") from e
+
+        # Files are kept only as ids, labels are indexed per image straight from the memory-mapped columns
+        self.im_files = [str(self.shard / x) for x in names]
+        self.label_files = img2label_paths(self.im_files)
+        self.labels = LabelColumns(lb, li)
+        self.shapes = shapes.astype(int)
+        self.segments = SegmentColumns(np.zeros((0, 2), dtype=np.float32), np.zeros(len(lb) + 1, dtype=np.int64), li)
+        self.spans = dict(zip(self.im_files, zip(offsets[:-1].tolist(), offsets[1:].tolist())))  # file: (start, end)
+        nl = len(lb)
+        LOGGER.info(f"{prefix}Shard {path}: {len(names)} images, {nl} labels, {offsets[-1] / (1 << 20):.1f}MB")
+        assert nl > 0 or not augment, f"{prefix}All labels empty in {path}, can not start training. {HELP_URL}"
+        self.cache_dir = self.shard.with_suffix(".images")  # --cache disk images, resized to img_size
+        self.init_samples(batch_size, single_cls, stride, pad, min_items, cache_images, prefix, rank, seed)
+
+    @property
+    def blob(self):
+        """Returns the read-only uint8 memory map of images.bin, opening it on first use in the current process."""
+        if self._blob is None:
+            self._blob = np.memmap(self.shard / "images.bin", dtype=np.uint8, mode="r")
+        return self._blob
+
+    def __getstate__(self):
+        """Drops the memory map when pickled to spawned workers, each worker maps the file itself."""
+        state = self.__dict__.copy()
+        state["_blob"] = None
+        return state
+
+    def image_keys(self):
+        """Returns a string per image from its byte span in images.bin and the blob's size and mtime."""
+        st = (self.shard / "images.bin").stat()
+        return [f"{f}:{self.spans[f][0]}:{self.spans[f][1]}:{st.st_size}:{st.st_mtime_ns}" for f in self.im_files]
+
+    def read_image(self, i, scale=1):
+        """Decodes the BGR image at index `i` at 1/`scale` resolution directly from a view into the memory-mapped
+        blob.
+        """
+        fn = self.npy_files[i]
+        if fn.exists():  # load npy
+            return np.load(fn)
+        start, end = self.spans[self.im_files[i]]  # survives the reordering done by init_samples()
+        im = cv2.imdecode(self.blob[start:end], DECODE_FLAGS[scale])  # BGR
+        assert im is not None, f"Image Not Decodable {self.im_files[i]}"
+        return im
+
+
 # Ancillary functions --------------------------------------------------------------------------------------------------
 def flatten_recursive(path=DATASETS_DIR / "coco128"):
     """Flattens a directory by copying all files from subdirectories to a new top-level directory, preserving
@@ -1133,6 +1810,39 @@ def autosplit(path=DATASETS_DIR / "coco128/images", weights=(0.9, 0.1, 0.0), ann
                 f.write(f"./{img.relative_to(path.parent).as_posix()}" + "\n")  # add image to txt file
 
 
+def benchmark_decode(path=DATASETS_DIR / "coco128/images", img_size=640, n=50, rounds=5):
+    """Times load_image() per image with full-resolution and reduced-resolution JPEG decoding, reporting the median of
+    `rounds` rounds that alternate which mode goes first, after reading all files once to warm the page cache
+    Usage: from utils.dataloaders import *; benchmark_decode('path/to/images', 640).
+
+    Arguments:
+        path:      Path to images directory
+        img_size:  Training image size
+        n:         Number of images to time
+        rounds:    Number of timed rounds per mode
+    """
+    dataset = LoadImagesAndLabels(path, img_size)
+    indices = range(min(n, dataset.n))
+    for i in indices:  # warm up the page cache so neither mode pays for disk reads
+        Path(dataset.im_files[i]).read_bytes()
+    t = {False: [], True: []}
+    for r in range(rounds):
+        for reduced in (False, True) if r % 2 == 0 else (True, False):
+            dataset.reduced_decode = reduced
+            t0 = time.perf_counter()
+            for i in indices:
+                dataset.load_image(i)
+            t[reduced].append((time.perf_counter() - t0) / len(indices) * 1e3)  # ms per image
+    t = {k: float(np.median(v)) for k, v in t.items()}
+    scales = [dataset.decode_scale(i) for i in indices]
+    print(
+        f"load_image() at {img_size}: {t[False]:.1f}ms full decode, {t[True]:.1f}ms reduced decode "
+        f"({t[False] / t[True]:.1f}x, median of {rounds}), images decoded at "
+        + ", ".join(f"1/{k}: {scales.count(k)}" for k in (1, 2, 4, 8))
+    )
+    return t
+
+
 def verify_image_label(args):
     """Verifies a single image-label pair, ensuring image format, size, and legal label values."""
     im_file, lb_file, prefix = args